@@ -1,17 +1,27 @@
 ﻿"""Cloudflared utilities package."""
-from .is_online import is_online, check_connection
+from .is_online import is_online, check_connection, check_connection_async, ConnectivityMonitor, probe_edge
 from .vpn_detect import is_vpn_connected, get_vpn_details
 from .bin_loader import get_platform_binaries, get_platform_key, get_bin
+from .bin_loader import get_platform_binaries_async, get_bin_async
+from .store import prune as prune_store
+from .monitor import NetworkMonitor
 from .runner import TunnelRunner
 
 __all__ = [
     "is_online",
     "check_connection",
+    "check_connection_async",
+    "ConnectivityMonitor",
+    "probe_edge",
     "is_vpn_connected",
     "get_vpn_details",
     "get_platform_binaries",
     "get_platform_key",
     "get_bin",
+    "get_platform_binaries_async",
+    "get_bin_async",
+    "prune_store",
+    "NetworkMonitor",
     "TunnelRunner"
 ]
 
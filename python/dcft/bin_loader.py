@@ -1,20 +1,125 @@
 """Binary loader with silent operation and optional progress display."""
 import os
 import sys
+import json
+import asyncio
+import time
 import platform
-import requests
 from pathlib import Path
+from . import downloader
+from . import merkle
+from . import store
+from .filelock import FileLock
+from .downloader import CHUNK_SIZE, CONNECTIONS, select_digest
 
-BIN_JSON = "https://raw.githubusercontent.com/QudsLab/Cloudflared/refs/heads/main/bin.json"
+# Manifest location; override with DCFT_BIN_JSON (http(s):// or file://) to use a mirror
+BIN_JSON = os.environ.get(
+    "DCFT_BIN_JSON",
+    "https://raw.githubusercontent.com/QudsLab/Cloudflared/refs/heads/main/bin.json"
+)
+VERIFIED_MANIFEST = ".verified.json"
+MANIFEST_CACHE = ".bin.json.cache"
+MANIFEST_TTL = 3600
 
-def load_bin_config():
-    """Load binary configuration from remote JSON file."""
+def _read_manifest_cache(cache_path):
+    """Read a cached bin.json entry, or None."""
     try:
-        response = requests.get(BIN_JSON, timeout=10)
+        with open(cache_path, 'r') as f:
+            cached = json.load(f)
+        if isinstance(cached, dict) and isinstance(cached.get('config'), dict):
+            return cached
+    except:
+        pass
+    return None
+
+def _write_manifest_cache(cache_path, cached):
+    """Atomically persist a cached bin.json entry."""
+    tmp_path = f"{cache_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(cached, f)
+        os.replace(tmp_path, cache_path)
+    except:
+        try:
+            os.remove(tmp_path)
+        except:
+            pass
+
+def expire_manifest_cache(cache_dir, cache_name=MANIFEST_CACHE):
+    """Force the next load_bin_config call to revalidate the cached manifest."""
+    cache_path = os.path.join(cache_dir, cache_name)
+    cached = _read_manifest_cache(cache_path)
+    if cached:
+        cached['fetched_at'] = 0
+        _write_manifest_cache(cache_path, cached)
+
+def load_bin_config(cache_dir=None, ttl=MANIFEST_TTL, url=None, session=None, cache_name=MANIFEST_CACHE):
+    """
+    Load binary configuration from remote JSON file.
+    
+    A file:// URL is read straight from disk and never cached.
+    
+    With a cache_dir, the manifest is stored there together with its
+    ETag/Last-Modified. A cache younger than ttl seconds is served without
+    touching the network; an older one is revalidated with a conditional
+    GET (a 304 transfers no body). If the request fails the cached
+    manifest is served regardless of its age.
+    
+    Args:
+        cache_dir: Directory holding the manifest cache (None = no cache)
+        ttl: Seconds a cached manifest is used without revalidation
+        url: Manifest URL (default: BIN_JSON)
+        session: requests.Session to use (default: the shared pooled session)
+        cache_name: Cache file name inside cache_dir
+    
+    Returns:
+        dict: Parsed bin.json, or {} if unavailable
+    """
+    url = url or BIN_JSON
+    path = downloader.local_path(url)
+    if path is not None:
+        try:
+            with open(path, 'r') as f:
+                return json.load(f)
+        except:
+            return {}
+    
+    cache_path = os.path.join(cache_dir, cache_name) if cache_dir else None
+    cached = _read_manifest_cache(cache_path) if cache_path else None
+    if cached and cached.get('url') != url:
+        cached = None
+    
+    if cached and time.time() - cached.get('fetched_at', 0) < ttl:
+        return cached['config']
+    
+    headers = {}
+    if cached:
+        if cached.get('etag'):
+            headers['If-None-Match'] = cached['etag']
+        if cached.get('last_modified'):
+            headers['If-Modified-Since'] = cached['last_modified']
+    
+    try:
+        response = (session or downloader.get_session()).get(url, headers=headers, timeout=10)
+        if response.status_code == 304 and cached:
+            cached['fetched_at'] = time.time()
+            _write_manifest_cache(cache_path, cached)
+            return cached['config']
         response.raise_for_status()
-        return response.json()
+        config = response.json()
     except:
-        return {}
+        return cached['config'] if cached else {}
+    
+    if cache_path and isinstance(config, dict):
+        os.makedirs(cache_dir, exist_ok=True)
+        _write_manifest_cache(cache_path, {
+            'url': url,
+            'etag': response.headers.get('ETag'),
+            'last_modified': response.headers.get('Last-Modified'),
+            'fetched_at': time.time(),
+            'config': config
+        })
+    return config
 
 def is_android():
     """Detect if running on Android."""
@@ -63,52 +168,219 @@ def get_platform_key():
     else:
         return None
 
-def download_file(url, dest_path, show_progress=False, progress_callback=None):
-    """Download a file with optional progress display."""
+def download_file(url, dest_path, show_progress=False, progress_callback=None,
+                  expected_sha256=None, expected_md5=None, connections=CONNECTIONS, compressed=None,
+                  session=None):
+    """
+    Download a file with optional progress display.
+    
+    Large files are fetched as parallel Range segments and resumed after
+    an interruption (see dcft.downloader). The body is hashed as it
+    arrives and the ``.part`` file is only renamed to ``dest_path`` once
+    the digest matches, so a bad download never replaces an existing file.
+    
+    Args:
+        url: Source URL
+        dest_path: Final file path
+        show_progress: Report progress through progress_callback
+        progress_callback: Function(downloaded, total, percent), throttled
+        expected_sha256: Expected SHA256 hex digest (preferred)
+        expected_md5: Expected MD5 hex digest (used when no SHA256 is given)
+        connections: Parallel connections for ranged downloads
+        compressed: The file's ``compressed`` entry from bin.json; when its
+            format is supported it is tried first and decompressed on the fly
+        session: requests.Session to use (default: the shared pooled session)
+    
+    Returns:
+        bool: True if the file was downloaded and verified
+    """
+    mode = None if sys.platform == 'win32' else 0o755
+    if compressed and compressed.get('url') and compressed.get('format') in downloader.DECOMPRESSORS:
+        if downloader.download_compressed(
+            compressed['url'],
+            dest_path,
+            compressed['format'],
+            expected_sha256=expected_sha256,
+            expected_md5=expected_md5,
+            compressed_sha256=compressed.get('sha256'),
+            progress_callback=progress_callback if show_progress else None,
+            session=session,
+            mode=mode
+        ):
+            return True
+    
+    return downloader.download(
+        url,
+        dest_path,
+        expected_sha256=expected_sha256,
+        expected_md5=expected_md5,
+        progress_callback=progress_callback if show_progress else None,
+        connections=connections,
+        session=session,
+        mode=mode
+    )
+
+def fetch_artifact(file_info, dest_path, repair=True, show_progress=False, progress_callback=None,
+                   session=None):
+    """
+    Fetch one bin.json file entry to dest_path, verified.
+    
+    If a damaged copy already exists and the entry carries chunk hashes,
+    only the mismatching chunks are re-downloaded (see dcft.merkle).
+    Otherwise the compressed variant or the plain file is downloaded.
+    
+    Args:
+        file_info: File entry from bin.json
+        dest_path: Final file path
+        repair: Try a chunk-level repair of an existing file first
+        show_progress: Report progress through progress_callback
+        progress_callback: Function(downloaded, total, percent)
+        session: requests.Session to use (default: the shared pooled session)
+    
+    Returns:
+        bool: True if dest_path now holds the verified file
+    """
+    url = file_info.get('url')
+    sha256 = file_info.get('sha256')
+    md5 = file_info.get('md5')
+    
+    if repair and file_info.get('chunks') and os.path.exists(dest_path):
+        if merkle.repair_file(
+            url,
+            dest_path,
+            file_info['chunks'],
+            file_info.get('size'),
+            expected_sha256=sha256,
+            expected_md5=md5,
+            progress_callback=progress_callback if show_progress else None,
+            session=session,
+            mode=None if sys.platform == 'win32' else 0o755
+        ):
+            return True
+    
+    return download_file(
+        url,
+        dest_path,
+        show_progress=show_progress,
+        progress_callback=progress_callback,
+        expected_sha256=sha256,
+        expected_md5=md5,
+        compressed=file_info.get('compressed'),
+        session=session
+    )
+
+def verify_checksum(file_path, expected_sha256=None, expected_md5=None):
+    """Verify file checksum (SHA256 if given, else MD5) without loading it into memory."""
     try:
-        response = requests.get(url, stream=True, timeout=30)
-        response.raise_for_status()
-        
-        total_size = int(response.headers.get('content-length', 0))
-        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        digest, expected = select_digest(expected_sha256, expected_md5)
+        if not digest:
+            return os.path.isfile(file_path)
         
-        downloaded = 0
-        with open(dest_path, 'wb') as f:
-            for chunk in response.iter_content(chunk_size=8192):
-                if chunk:
-                    f.write(chunk)
-                    downloaded += len(chunk)
-                    
-                    if show_progress and progress_callback and total_size > 0:
-                        progress = (downloaded / total_size) * 100
-                        progress_callback(downloaded, total_size, progress)
+        with open(file_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
         
-        return True
+        return digest.hexdigest() == expected
     except:
         return False
 
-def verify_checksum(file_path, expected_sha256=None, expected_md5=None):
-    """Verify file checksum (SHA256 or MD5)."""
-    import hashlib
+def _stat_key(file_path):
+    """Return the (size, mtime_ns, inode) tuple identifying a file on disk."""
+    st = os.stat(file_path)
+    return [st.st_size, st.st_mtime_ns, st.st_ino]
+
+def load_verified_manifest(bin_dir):
+    """Load the sidecar manifest of verified binaries in bin_dir."""
     try:
-        with open(file_path, 'rb') as f:
-            content = f.read()
-        
-        if expected_sha256:
-            sha256_hash = hashlib.sha256(content).hexdigest()
-            if sha256_hash != expected_sha256:
-                return False
-        
-        if expected_md5:
-            md5_hash = hashlib.md5(content).hexdigest()
-            if md5_hash != expected_md5:
-                return False
-        
+        with open(os.path.join(bin_dir, VERIFIED_MANIFEST), 'r') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except:
+        return {}
+
+def save_verified_manifest(bin_dir, manifest):
+    """Atomically write the sidecar manifest of verified binaries."""
+    manifest_path = os.path.join(bin_dir, VERIFIED_MANIFEST)
+    tmp_path = f"{manifest_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, manifest_path)
         return True
     except:
+        try:
+            os.remove(tmp_path)
+        except:
+            pass
+        return False
+
+def record_verified(file_path, expected_sha256=None, expected_md5=None):
+    """Remember that file_path matched its digest at its current stat."""
+    try:
+        bin_dir, filename = os.path.split(file_path)
+        size, mtime_ns, inode = _stat_key(file_path)
+        manifest = load_verified_manifest(bin_dir)
+        manifest[filename] = {
+            'size': size,
+            'mtime_ns': mtime_ns,
+            'inode': inode,
+            'sha256': (expected_sha256 or '').lower() or None,
+            'md5': None if expected_sha256 else (expected_md5 or '').lower() or None
+        }
+        return save_verified_manifest(bin_dir, manifest)
+    except:
+        return False
+
+def forget_verified(file_path):
+    """Drop file_path from the verified manifest."""
+    bin_dir, filename = os.path.split(file_path)
+    manifest = load_verified_manifest(bin_dir)
+    if manifest.pop(filename, None) is not None:
+        save_verified_manifest(bin_dir, manifest)
+
+def is_verified(file_path, expected_sha256=None, expected_md5=None, deep=False):
+    """
+    Check a binary against its digest, using the stat-keyed manifest.
+    
+    When the file's (size, mtime_ns, inode) still matches the entry recorded
+    for the same digest, this costs a single stat(). Otherwise, or when
+    deep is True, the file is fully re-hashed and the manifest refreshed.
+    
+    Args:
+        file_path: Path to the binary
+        expected_sha256: Expected SHA256 hex digest
+        expected_md5: Expected MD5 hex digest
+        deep: Always re-hash the file
+    
+    Returns:
+        bool: True if the file matches
+    """
+    try:
+        stat_key = _stat_key(file_path)
+    except OSError:
         return False
+    
+    if not deep:
+        bin_dir, filename = os.path.split(file_path)
+        entry = load_verified_manifest(bin_dir).get(filename) or {}
+        recorded = [entry.get('size'), entry.get('mtime_ns'), entry.get('inode')]
+        if expected_sha256:
+            same_digest = entry.get('sha256') == expected_sha256.lower()
+        else:
+            same_digest = bool(expected_md5) and entry.get('md5') == expected_md5.lower()
+        if same_digest and recorded == stat_key:
+            return True
+    
+    if verify_checksum(file_path, expected_sha256, expected_md5):
+        record_verified(file_path, expected_sha256, expected_md5)
+        return True
+    
+    forget_verified(file_path)
+    return False
 
-def get_platform_binaries(bin_dir, force_download=False, update=False, debug=False, progress_callback=None):
+def get_platform_binaries(bin_dir, force_download=False, update=False, debug=False, progress_callback=None,
+                          deep_verify=False, manifest_ttl=MANIFEST_TTL, use_store=True, store_dir=None,
+                          bin_json=None, session=None):
     """
     Get and download binaries for the current platform.
     
@@ -118,11 +390,18 @@ def get_platform_binaries(bin_dir, force_download=False, update=False, debug=Fal
         update: Check and download if newer version available
         debug: Show download progress
         progress_callback: Function(downloaded, total, percent) for progress updates
+        deep_verify: Re-hash an existing binary even if its stat is unchanged
+        manifest_ttl: Seconds the cached bin.json is trusted (update mode always revalidates)
+        use_store: Keep the artifact in the shared content-addressed store and link it into bin_dir
+        store_dir: Shared store directory (default: ~/.cfbin/store)
+        bin_json: Manifest URL, http(s):// or file:// (default: BIN_JSON)
+        session: requests.Session (or one with a custom transport adapter) for all HTTP
     
     Returns:
         str: Path to binary file or None if failed
     """
-    bin_config = load_bin_config()
+    bin_config = load_bin_config(cache_dir=bin_dir, ttl=0 if update else manifest_ttl, url=bin_json,
+                                 session=session)
     if not bin_config or 'platforms' not in bin_config:
         return None
     
@@ -150,41 +429,38 @@ def get_platform_binaries(bin_dir, force_download=False, update=False, debug=Fal
     
     # Check if file exists and is valid
     if os.path.exists(dest_path) and not force_download:
-        if verify_checksum(dest_path, sha256, md5):
-            if not update:
-                return dest_path
-            # For update mode, we could add version checking here
-            # For now, treat existing valid file as up-to-date
+        # In update mode the manifest was just revalidated, so a match is current
+        if is_verified(dest_path, sha256, md5, deep=deep_verify):
             return dest_path
     
-    # Download the file
-    download_success = download_file(
-        url, 
-        dest_path, 
-        show_progress=debug,
-        progress_callback=progress_callback
-    )
-    
-    if not download_success:
-        return None
-    
-    # Verify downloaded file
-    if verify_checksum(dest_path, sha256, md5):
-        # Make executable on Unix-like systems
-        if sys.platform != 'win32':
-            try:
-                os.chmod(dest_path, 0o755)
-            except:
-                pass
-        return dest_path
-    else:
-        try:
-            os.remove(dest_path)
-        except:
-            pass
-        return None
+    # Only one process fetches; the others wait and reuse its artifact
+    with FileLock(dest_path + '.lock'):
+        if not force_download and is_verified(dest_path, sha256, md5):
+            return dest_path
+        
+        if sha256 and use_store:
+            # Fetch into the shared content-addressed store, then link
+            blob = store.blob_path(sha256, store_dir)
+            with FileLock(blob + '.lock'):
+                if force_download or not is_verified(blob, sha256):
+                    if not fetch_artifact(file_info, blob, repair=not force_download, show_progress=debug,
+                                          progress_callback=progress_callback, session=session):
+                        return None
+                    record_verified(blob, sha256)
+                if not store.link_into(sha256, dest_path, store_dir):
+                    return None
+        else:
+            # Download to a temp file, verify, then atomically replace
+            if not fetch_artifact(file_info, dest_path, repair=not force_download, show_progress=debug,
+                                  progress_callback=progress_callback, session=session):
+                return None
+        
+        record_verified(dest_path, sha256, md5)
+    return dest_path
 
-def get_bin(bin_dir=None, debug=True, force_download=False, update=False, progress_callback=None):
+def get_bin(bin_dir=None, debug=True, force_download=False, update=False, progress_callback=None,
+            deep_verify=False, manifest_ttl=MANIFEST_TTL, use_store=True, store_dir=None, bin_json=None,
+            session=None):
     """
     Get binary path, download if needed.
     
@@ -194,6 +470,12 @@ def get_bin(bin_dir=None, debug=True, force_download=False, update=False, progre
         force_download: Force re-download
         update: Check for updates
         progress_callback: Progress callback function
+        deep_verify: Re-hash an existing binary instead of trusting the stat cache
+        manifest_ttl: Seconds the cached bin.json is trusted
+        use_store: Share the artifact through the content-addressed store
+        store_dir: Shared store directory (default: ~/.cfbin/store)
+        bin_json: Manifest URL, http(s):// or file:// (default: BIN_JSON)
+        session: requests.Session (or one with a custom transport adapter) for all HTTP
     
     Returns:
         str: Path to binary or None
@@ -210,5 +492,24 @@ def get_bin(bin_dir=None, debug=True, force_download=False, update=False, progre
         force_download=force_download,
         update=update,
         debug=debug,
-        progress_callback=progress_callback
-    )
\ No newline at end of file
+        progress_callback=progress_callback,
+        deep_verify=deep_verify,
+        manifest_ttl=manifest_ttl,
+        use_store=use_store,
+        store_dir=store_dir,
+        bin_json=bin_json,
+        session=session
+    )
+
+async def get_platform_binaries_async(bin_dir, **kwargs):
+    """
+    Async counterpart of get_platform_binaries.
+    
+    The manifest fetch, download and verification run in a worker thread,
+    so the event loop is never blocked. Accepts the same keyword arguments.
+    """
+    return await asyncio.to_thread(get_platform_binaries, bin_dir, **kwargs)
+
+async def get_bin_async(bin_dir=None, **kwargs):
+    """Async counterpart of get_bin; accepts the same keyword arguments."""
+    return await asyncio.to_thread(get_bin, bin_dir, **kwargs)
\ No newline at end of file
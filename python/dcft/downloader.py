@@ -0,0 +1,443 @@
+"""Segmented, resumable HTTP downloads with streaming verification."""
+import os
+import re
+import json
+import lzma
+import time
+import zlib
+import hashlib
+import threading
+import requests
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+from requests.adapters import HTTPAdapter
+from concurrent.futures import ThreadPoolExecutor
+
+CHUNK_SIZE = 64 * 1024
+SEGMENT_SIZE = 4 * 1024 * 1024
+CONNECTIONS = 4
+RETRIES = 3
+PROGRESS_INTERVAL = 0.1
+STATE_SAVE_INTERVAL = 1.0
+POOL_SIZE = 16
+
+# Streaming decoders for the compressed variants published in bin.json
+DECOMPRESSORS = {
+    'xz': lzma.LZMADecompressor,
+    'gz': lambda: zlib.decompressobj(wbits=31),
+}
+
+
+def select_digest(expected_sha256=None, expected_md5=None):
+    """Pick the digest used for verification: SHA256 when known, MD5 otherwise."""
+    if expected_sha256:
+        return hashlib.sha256(), expected_sha256.lower()
+    if expected_md5:
+        return hashlib.md5(), expected_md5.lower()
+    return None, None
+
+
+class ProgressReporter:
+    """Thread-safe byte counter that calls back at most once per interval."""
+
+    def __init__(self, callback, total, interval=PROGRESS_INTERVAL, initial=0):
+        self.callback = callback
+        self.total = total
+        self.interval = interval
+        self.downloaded = initial
+        self._last = 0.0
+        self._lock = threading.Lock()
+
+    def update(self, nbytes):
+        """Add nbytes and report if the interval has elapsed or the total is reached."""
+        with self._lock:
+            self.downloaded += nbytes
+            now = time.monotonic()
+            if self.downloaded < self.total and now - self._last < self.interval:
+                return
+            self._last = now
+            self._emit()
+
+    def _emit(self):
+        if self.callback and self.total > 0:
+            self.callback(self.downloaded, self.total, (self.downloaded / self.total) * 100)
+
+
+class _OrderedHasher:
+    """Feed segments to a digest in file order as soon as they complete."""
+
+    def __init__(self, digest, part_path, segments):
+        self.digest = digest
+        self.part_path = part_path
+        self.segments = segments
+        self._next = 0
+        self._done = set()
+        self._lock = threading.Lock()
+
+    def segment_done(self, index):
+        with self._lock:
+            self._done.add(index)
+            if self._next not in self._done:
+                return
+            with open(self.part_path, 'rb') as f:
+                while self._next in self._done:
+                    start, end = self.segments[self._next]
+                    f.seek(start)
+                    remaining = end - start
+                    while remaining > 0:
+                        chunk = f.read(min(CHUNK_SIZE, remaining))
+                        if not chunk:
+                            raise IOError("short read while hashing")
+                        self.digest.update(chunk)
+                        remaining -= len(chunk)
+                    self._next += 1
+
+
+def new_session(connections=POOL_SIZE):
+    """Create a requests session keeping up to `connections` connections per host alive."""
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=connections)
+    session.mount('http://', adapter)
+    session.mount('https://', adapter)
+    return session
+
+
+_session = None
+_session_lock = threading.Lock()
+
+
+def get_session():
+    """
+    Return the process-wide pooled session used by the loader.
+
+    Reusing it keeps TCP/TLS connections alive across manifest fetches,
+    downloads and repairs.
+    """
+    global _session
+    with _session_lock:
+        if _session is None:
+            _session = new_session()
+        return _session
+
+
+def set_session(session):
+    """
+    Replace the shared session, e.g. with one that mounts a custom
+    transport adapter. Pass None to go back to a fresh default session.
+    """
+    global _session
+    with _session_lock:
+        _session = session
+
+
+def local_path(url):
+    """Return the filesystem path of a file:// URL, or None for other schemes."""
+    parsed = urlparse(url)
+    if parsed.scheme != 'file':
+        return None
+    return url2pathname(parsed.path)
+
+
+def open_stream(session, url):
+    """
+    Open url for sequential reading.
+
+    Supports http(s) through the session and file:// URLs from disk.
+
+    Returns:
+        tuple: (total_size, chunk_iterator, close)
+    """
+    path = local_path(url)
+    if path is not None:
+        f = open(path, 'rb')
+        return os.fstat(f.fileno()).st_size, iter(lambda: f.read(CHUNK_SIZE), b''), f.close
+    response = session.get(url, stream=True, timeout=30)
+    try:
+        response.raise_for_status()
+    except requests.RequestException:
+        response.close()
+        raise
+    total = int(response.headers.get('content-length', 0))
+    return total, response.iter_content(chunk_size=CHUNK_SIZE), response.close
+
+
+def _probe_ranges(session, url):
+    """
+    Check whether the server honours Range requests.
+
+    Returns:
+        tuple: (size, validator) if ranges are supported, else (None, None)
+    """
+    if local_path(url) is not None:
+        return None, None
+    try:
+        response = session.get(url, headers={'Range': 'bytes=0-0'}, stream=True, timeout=30)
+        try:
+            if response.status_code != 206:
+                return None, None
+            match = re.match(r'bytes\s+0-0/(\d+)', response.headers.get('Content-Range', ''))
+            if not match:
+                return None, None
+            validator = response.headers.get('ETag') or response.headers.get('Last-Modified')
+            return int(match.group(1)), validator
+        finally:
+            response.close()
+    except requests.RequestException:
+        return None, None
+
+
+def _download_stream(session, url, part_path, digest, reporter):
+    """Single-connection download that hashes chunks as they are written."""
+    reporter.total, chunks, close = open_stream(session, url)
+    try:
+        with open(part_path, 'wb') as f:
+            for chunk in chunks:
+                if chunk:
+                    f.write(chunk)
+                    if digest:
+                        digest.update(chunk)
+                    reporter.update(len(chunk))
+    finally:
+        close()
+
+
+def _load_state(state_path, part_path, fingerprint):
+    """Return the persisted per-segment progress if it belongs to this download."""
+    try:
+        with open(state_path, 'r') as f:
+            state = json.load(f)
+        if state.get('fingerprint') != fingerprint:
+            return None
+        if os.path.getsize(part_path) != fingerprint['size']:
+            return None
+        return state['done']
+    except:
+        return None
+
+
+def _save_state(state_path, fingerprint, done):
+    tmp_path = f"{state_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp_path, 'w') as f:
+            json.dump({'fingerprint': fingerprint, 'done': done}, f)
+        os.replace(tmp_path, state_path)
+    except OSError:
+        pass
+
+
+def _download_ranges(session, url, part_path, size, validator, digest, reporter,
+                     connections, segment_size, retries):
+    """
+    Fetch url as Range segments over a pool of connections.
+
+    Per-segment progress is persisted next to the .part file so an
+    interrupted download resumes where it stopped.
+
+    Returns:
+        bool: True once every segment is complete
+    """
+    state_path = part_path + '.state'
+    segments = [(start, min(start + segment_size, size)) for start in range(0, size, segment_size)]
+    fingerprint = {'url': url, 'size': size, 'validator': validator, 'segment_size': segment_size}
+
+    done = _load_state(state_path, part_path, fingerprint)
+    if done is None or len(done) != len(segments):
+        done = [0] * len(segments)
+        with open(part_path, 'wb') as f:
+            f.truncate(size)
+        _save_state(state_path, fingerprint, done)
+
+    reporter.total = size
+    reporter.downloaded = sum(done)
+    hasher = _OrderedHasher(digest, part_path, segments) if digest else None
+    lock = threading.Lock()
+    last_save = [time.monotonic()]
+
+    def fetch_segment(index):
+        start, end = segments[index]
+        for _ in range(retries + 1):
+            offset = start + done[index]
+            if offset >= end:
+                break
+            headers = {'Range': f'bytes={offset}-{end - 1}'}
+            if validator:
+                headers['If-Range'] = validator
+            try:
+                response = session.get(url, headers=headers, stream=True, timeout=30)
+                with response:
+                    if response.status_code != 206:
+                        raise IOError(f"unexpected status {response.status_code}")
+                    with open(part_path, 'r+b') as f:
+                        f.seek(offset)
+                        for chunk in response.iter_content(chunk_size=CHUNK_SIZE):
+                            chunk = chunk[:end - start - done[index]]
+                            if not chunk:
+                                continue
+                            f.write(chunk)
+                            f.flush()
+                            with lock:
+                                done[index] += len(chunk)
+                                if time.monotonic() - last_save[0] >= STATE_SAVE_INTERVAL:
+                                    last_save[0] = time.monotonic()
+                                    _save_state(state_path, fingerprint, done)
+                            reporter.update(len(chunk))
+            except (requests.RequestException, IOError, OSError):
+                continue
+        if start + done[index] < end:
+            return False
+        if hasher:
+            hasher.segment_done(index)
+        return True
+
+    try:
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            results = list(pool.map(fetch_segment, range(len(segments))))
+    finally:
+        with lock:
+            _save_state(state_path, fingerprint, done)
+
+    return all(results)
+
+
+def _cleanup(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def download(url, dest_path, expected_sha256=None, expected_md5=None, progress_callback=None,
+             connections=CONNECTIONS, segment_size=SEGMENT_SIZE, progress_interval=PROGRESS_INTERVAL,
+             retries=RETRIES, session=None, mode=None):
+    """
+    Download url to dest_path, verifying it before it is moved into place.
+
+    Servers that support Range requests are fetched in segments over
+    several pooled connections, with progress persisted in a .part.state
+    file so a later call resumes an interrupted download. Other servers
+    fall back to a single streamed request, and file:// URLs are copied
+    from disk. The digest is computed
+    incrementally and the artifact is never held in memory.
+
+    Args:
+        url: Source URL
+        dest_path: Final file path
+        expected_sha256: Expected SHA256 hex digest (preferred)
+        expected_md5: Expected MD5 hex digest (used when no SHA256 is given)
+        progress_callback: Function(downloaded, total, percent)
+        connections: Number of parallel connections for ranged downloads
+        segment_size: Size of each Range segment in bytes
+        progress_interval: Minimum seconds between progress callbacks
+        retries: Retries per segment before giving up
+        session: requests.Session to use (default: the shared session)
+        mode: Permission bits applied before the file is moved into place
+
+    Returns:
+        bool: True if the file was downloaded and verified
+    """
+    part_path = dest_path + '.part'
+    state_path = part_path + '.state'
+    session = session or get_session()
+
+    try:
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        digest, expected = select_digest(expected_sha256, expected_md5)
+        reporter = ProgressReporter(progress_callback, 0, progress_interval)
+
+        size, validator = _probe_ranges(session, url)
+        if size and size > segment_size and connections > 1:
+            if not _download_ranges(session, url, part_path, size, validator, digest, reporter,
+                                    connections, segment_size, retries):
+                return False
+        else:
+            _cleanup(state_path)
+            _download_stream(session, url, part_path, digest, reporter)
+
+        if digest and digest.hexdigest() != expected:
+            _cleanup(part_path, state_path)
+            return False
+
+        if mode is not None:
+            os.chmod(part_path, mode)
+        os.replace(part_path, dest_path)
+        _cleanup(state_path)
+        return True
+    except:
+        if not os.path.exists(state_path):
+            _cleanup(part_path)
+        return False
+
+
+def download_compressed(url, dest_path, compression, expected_sha256=None, expected_md5=None,
+                        compressed_sha256=None, progress_callback=None,
+                        progress_interval=PROGRESS_INTERVAL, session=None, mode=None):
+    """
+    Download a compressed variant and decompress it straight to disk.
+
+    Both the compressed stream (when compressed_sha256 is given) and the
+    decompressed output are hashed as the data flows through, and the
+    result is only moved to dest_path once the uncompressed digest
+    matches. Progress is reported in compressed bytes. Unlike download(),
+    this is a single stream and is not resumable.
+
+    Args:
+        url: URL of the compressed file
+        dest_path: Final (decompressed) file path
+        compression: Key in DECOMPRESSORS ('xz' or 'gz')
+        expected_sha256: Expected SHA256 of the decompressed file (preferred)
+        expected_md5: Expected MD5 of the decompressed file
+        compressed_sha256: Expected SHA256 of the compressed file
+        progress_callback: Function(downloaded, total, percent)
+        progress_interval: Minimum seconds between progress callbacks
+        session: requests.Session to use (default: the shared session)
+        mode: Permission bits applied before the file is moved into place
+
+    Returns:
+        bool: True if the file was downloaded, decompressed and verified
+    """
+    if compression not in DECOMPRESSORS:
+        return False
+
+    part_path = dest_path + '.part'
+    session = session or get_session()
+
+    try:
+        os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+        digest, expected = select_digest(expected_sha256, expected_md5)
+        raw_digest = hashlib.sha256() if compressed_sha256 else None
+        decompressor = DECOMPRESSORS[compression]()
+
+        total, chunks, close = open_stream(session, url)
+        reporter = ProgressReporter(progress_callback, total, progress_interval)
+
+        try:
+            with open(part_path, 'wb') as f:
+                for chunk in chunks:
+                    if not chunk:
+                        continue
+                    if raw_digest:
+                        raw_digest.update(chunk)
+                    data = decompressor.decompress(chunk)
+                    if data:
+                        f.write(data)
+                        if digest:
+                            digest.update(data)
+                    reporter.update(len(chunk))
+        finally:
+            close()
+
+        if not decompressor.eof:
+            raise IOError("truncated compressed stream")
+        if raw_digest and raw_digest.hexdigest() != compressed_sha256.lower():
+            raise IOError("compressed digest mismatch")
+        if digest and digest.hexdigest() != expected:
+            raise IOError("digest mismatch")
+
+        if mode is not None:
+            os.chmod(part_path, mode)
+        os.replace(part_path, dest_path)
+        return True
+    except:
+        _cleanup(part_path)
+        return False
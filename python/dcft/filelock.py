@@ -0,0 +1,85 @@
+"""Minimal inter-process file lock (fcntl on POSIX, msvcrt on Windows)."""
+import os
+import sys
+import time
+
+if sys.platform == 'win32':
+    import msvcrt
+else:
+    import fcntl
+
+
+class FileLock:
+    """
+    Exclusive advisory lock held on a lock file.
+
+    Usage:
+        with FileLock("/path/to/file.lock"):
+            ...
+
+    The lock file is left in place after release; removing it would let
+    two processes lock different inodes for the same path.
+    """
+
+    def __init__(self, path, timeout=None, poll_interval=0.1):
+        """
+        Args:
+            path: Lock file path (created if missing)
+            timeout: Seconds to wait before raising TimeoutError (None = forever)
+            poll_interval: Sleep between attempts while waiting
+        """
+        self.path = path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._fd = None
+
+    def _try_lock(self, fd):
+        try:
+            if sys.platform == 'win32':
+                msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+            else:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except OSError:
+            return False
+
+    def acquire(self):
+        """Block until the lock is held."""
+        if self._fd is not None:
+            return
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+
+        if self.timeout is None and sys.platform != 'win32':
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            self._fd = fd
+            return
+
+        deadline = None if self.timeout is None else time.monotonic() + self.timeout
+        while not self._try_lock(fd):
+            if deadline is not None and time.monotonic() >= deadline:
+                os.close(fd)
+                raise TimeoutError(f"Timed out waiting for lock {self.path}")
+            time.sleep(self.poll_interval)
+        self._fd = fd
+
+    def release(self):
+        """Release the lock if held."""
+        if self._fd is None:
+            return
+        try:
+            if sys.platform == 'win32':
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+            else:
+                fcntl.flock(self._fd, fcntl.LOCK_UN)
+        finally:
+            os.close(self._fd)
+            self._fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
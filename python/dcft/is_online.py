@@ -1,45 +1,534 @@
 # check the internet connection status
+import os
+import copy
+import time
+import errno
+import random
 import socket
+import struct
+import asyncio
+import selectors
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+
+# Public DNS resolvers: Google, Cloudflare, Quad9
+DEFAULT_TARGETS = [("8.8.8.8", 53), ("1.1.1.1", 53), ("9.9.9.9", 53)]
+IPV6_TARGETS = [("2001:4860:4860::8888", 53), ("2606:4700:4700::1111", 53), ("2620:fe::fe", 53)]
+DEFAULT_TIMEOUT = 3
+# connect_ex() results of a non-blocking connect that is still in progress
+_IN_PROGRESS = {errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN, getattr(errno, "WSAEWOULDBLOCK", 10035)}
+
+# Cloudflare edge endpoints cloudflared connects to (the targets of its SRV records)
+EDGE_HOSTS = ("region1.v2.argotunnel.com", "region2.v2.argotunnel.com")
+EDGE_PORT = 7844
+EDGE_ADDRESSES_PER_HOST = 2
+# QUIC probe: a padded long-header packet with a reserved 0x?a?a?a?a version,
+# which a QUIC server must answer with Version Negotiation (RFC 9000, 6.1)
+QUIC_PROBE_VERSION = 0x1A2A3A4A
+QUIC_PROBE_SIZE = 1200
+# Once TCP answered, how long QUIC still gets to answer before http2 is picked
+QUIC_GRACE = 0.3
+# How long a successful edge probe is reused, in seconds
+EDGE_MAX_AGE = 300
+
+# Background re-probe interval, doubled while the state stays the same
+MONITOR_INTERVAL = 15
+MONITOR_MAX_INTERVAL = 120
+MONITOR_JITTER = 0.2
+# Oldest cached state a running monitor can leave behind (max interval plus jitter)
+STATE_MAX_AGE = MONITOR_MAX_INTERVAL * (1 + MONITOR_JITTER) + DEFAULT_TIMEOUT
+
+# Last answer per (policy, targets): (online, monotonic time)
+_state = {}
+_state_lock = threading.Lock()
+# Process-wide ConnectivityMonitor per policy
+_monitors = {}
+# Last probe_edge() result per (hosts, ports): (result, monotonic time)
+_edge_state = {}
+
+
+def _required(policy, count):
+    """Number of successful targets a policy needs: 'any', 'all' or an int k."""
+    if policy == "any":
+        return 1
+    if policy == "all":
+        return count
+    return max(1, min(int(policy), count))
+
+
+def _address(host, port):
+    """First (family, sockaddr) for host; numeric IPv4/IPv6 addresses never hit DNS."""
+    try:
+        info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM, 0, socket.AI_NUMERICHOST)
+    except socket.gaierror:
+        info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    family, _, _, _, sockaddr = info[0]
+    return family, sockaddr
+
+
+def _handshakes(targets, timeout, required=None, skipped=None):
+    """
+    Non-blocking TCP connects to every target at once.
+
+    Stops early once `required` targets answered or can no longer answer.
+
+    Returns:
+        list: Handshake latency in ms per target, None where it failed or
+            timed out, `skipped` where it was still pending when it stopped early
+    """
+    required = len(targets) if required is None else required
+    latencies = [None] * len(targets)
+    succeeded = failed = 0
+    selector = selectors.DefaultSelector()
+    sockets = []
+    start = time.perf_counter()
+    try:
+        for index, (host, port) in enumerate(targets):
+            try:
+                family, sockaddr = _address(host, port)
+                sock = socket.socket(family, socket.SOCK_STREAM)
+            except OSError:
+                failed += 1
+                continue
+            sockets.append(sock)
+            sock.setblocking(False)
+            err = sock.connect_ex(sockaddr)
+            if err == 0:
+                latencies[index] = (time.perf_counter() - start) * 1000
+                succeeded += 1
+            elif err in _IN_PROGRESS:
+                selector.register(sock, selectors.EVENT_WRITE, index)
+            else:
+                failed += 1
+
+        deadline = time.monotonic() + timeout
+        while succeeded < required and len(targets) - failed >= required and selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return latencies
+            for key, _ in selector.select(remaining):
+                selector.unregister(key.fileobj)
+                if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) == 0:
+                    latencies[key.data] = (time.perf_counter() - start) * 1000
+                    succeeded += 1
+                else:
+                    failed += 1
+        for key in selector.get_map().values():
+            latencies[key.data] = skipped
+        return latencies
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
+
+
+def probe_targets(targets=None, policy="all", timeout=DEFAULT_TIMEOUT):
+    """
+    Connect to several targets at once and stop as soon as the policy is decided.
+
+    All connects share one timeout and run without threads; every socket
+    is closed before returning.
+
+    Args:
+        targets: (host, port) pairs, IPv4 or IPv6 (default: DEFAULT_TARGETS)
+        policy: 'any', 'all', or k (at least k targets must answer)
+        timeout: Seconds to wait for the whole probe
+
+    Returns:
+        bool: True if enough targets accepted a connection
+    """
+    targets = targets or DEFAULT_TARGETS
+    required = _required(policy, len(targets))
+    latencies = _handshakes(targets, timeout, required)
+    return sum(1 for ms in latencies if ms is not None) >= required
+
+
+def _quic_probe_packet(scid):
+    dcid = os.urandom(8)
+    packet = bytes([0xC3]) + struct.pack("!I", QUIC_PROBE_VERSION)
+    packet += bytes([len(dcid)]) + dcid + bytes([len(scid)]) + scid
+    return packet + bytes(QUIC_PROBE_SIZE - len(packet))
+
+
+def _is_version_negotiation(data, scid):
+    """Long header, version 0, and our source connection ID echoed as destination."""
+    return (len(data) >= 6 + len(scid) and bool(data[0] & 0x80) and data[1:5] == b"\0\0\0\0"
+            and data[5] == len(scid) and data[6:6 + len(scid)] == scid)
+
+
+def _quic_handshakes(targets, timeout, cancel=None, skipped=None):
+    """
+    Send a QUIC version-negotiation probe to every target at once.
+
+    Args:
+        targets: (host, port) pairs
+        timeout: Seconds to wait for answers
+        cancel: Socket that ends the wait early once it becomes readable
+        skipped: Reported for targets still unanswered when cancel fires
+
+    Returns:
+        list: Round-trip latency in ms per target, None where nothing valid came back
+    """
+    latencies = [None] * len(targets)
+    selector = selectors.DefaultSelector()
+    sockets = []
+    start = time.perf_counter()
+    try:
+        for index, (host, port) in enumerate(targets):
+            try:
+                family, sockaddr = _address(host, port)
+                sock = socket.socket(family, socket.SOCK_DGRAM)
+                sockets.append(sock)
+                sock.setblocking(False)
+                # Connected UDP socket: an ICMP port-unreachable surfaces as an error on recv
+                sock.connect(sockaddr)
+                scid = os.urandom(8)
+                sock.send(_quic_probe_packet(scid))
+            except OSError:
+                continue
+            selector.register(sock, selectors.EVENT_READ, (index, scid))
+        if cancel is not None:
+            selector.register(cancel, selectors.EVENT_READ, None)
+
+        deadline = time.monotonic() + timeout
+        while len(selector.get_map()) > (cancel is not None):
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            events = selector.select(remaining)
+            if any(key.data is None for key, _ in events):
+                for key in selector.get_map().values():
+                    if key.data is not None:
+                        latencies[key.data[0]] = skipped
+                break
+            for key, _ in events:
+                index, scid = key.data
+                try:
+                    data = key.fileobj.recv(2048)
+                except BlockingIOError:
+                    continue
+                except OSError:
+                    selector.unregister(key.fileobj)
+                    continue
+                if _is_version_negotiation(data, scid):
+                    latencies[index] = (time.perf_counter() - start) * 1000
+                    selector.unregister(key.fileobj)
+        return latencies
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
+
+
+def _resolve(host, port):
+    """Addresses of host (deduplicated, resolver order) and the lookup time in ms."""
+    start = time.perf_counter()
+    try:
+        info = socket.getaddrinfo(host, port, 0, socket.SOCK_STREAM)
+    except OSError:
+        return [], None
+    addresses = []
+    for _, _, _, _, sockaddr in info:
+        if sockaddr[0] not in addresses:
+            addresses.append(sockaddr[0])
+    return addresses, (time.perf_counter() - start) * 1000
+
+
+def probe_edge(hosts=EDGE_HOSTS, tcp_port=EDGE_PORT, udp_port=EDGE_PORT, timeout=DEFAULT_TIMEOUT,
+               per_host=EDGE_ADDRESSES_PER_HOST, max_age=None):
+    """
+    Check what a tunnel actually needs: the edge hostnames resolve, TCP
+    7844 accepts connections (http2) and UDP 7844 answers QUIC (quic).
+
+    Lookups, TCP connects and QUIC probes all run concurrently and share
+    one timeout. Once a TCP handshake succeeds QUIC only gets QUIC_GRACE
+    more seconds, so a network that drops UDP doesn't cost the whole
+    timeout. Point hosts and ports at local listeners to test it.
+
+    Addresses still pending when the probe stops early (TCP after the
+    first handshake, QUIC after the grace period) are marked 'skipped'
+    rather than reported as failures.
+
+    Args:
+        hosts: Edge hostnames (or IP addresses) to probe
+        tcp_port: Port for the TCP handshake (http2)
+        udp_port: Port for the QUIC probe
+        timeout: Seconds for the whole probe
+        per_host: Addresses probed per hostname
+        max_age: Return the last successful result if it is at most this
+            many seconds old instead of probing (default: always probe)
+
+    Returns:
+        dict: {
+            'dns': {host: {'addresses': [...], 'latency_ms': float or None}},
+            'http2': [{'address', 'latency_ms', 'skipped'}],
+            'quic': [{'address', 'latency_ms', 'skipped'}],
+            'protocol': 'quic', 'http2', or None if the edge is unreachable
+        }
+    """
+    key = (tuple(hosts), tcp_port, udp_port)
+    if max_age is not None:
+        with _state_lock:
+            cached = _edge_state.get(key)
+        if cached and cached[0]['protocol'] and time.monotonic() - cached[1] <= max_age:
+            return copy.deepcopy(cached[0])
+
+    deadline = time.monotonic() + timeout
+    result = {'dns': {}, 'http2': [], 'quic': [], 'protocol': None}
+    pool = ThreadPoolExecutor(max_workers=len(hosts) + 1)
+    cancel_r, cancel_w = socket.socketpair()
+    try:
+        lookups = {host: pool.submit(_resolve, host, tcp_port) for host in hosts}
+        # getaddrinfo() has no timeout of its own; a hung lookup is left behind
+        wait(list(lookups.values()), timeout=timeout)
+        addresses = []
+        for host, future in lookups.items():
+            found, latency = future.result() if future.done() else ([], None)
+            result['dns'][host] = {'addresses': found, 'latency_ms': latency}
+            addresses.extend(a for a in found[:per_host] if a not in addresses)
+        if not addresses:
+            return _remember_edge(key, result)
+
+        remaining = max(0.0, deadline - time.monotonic())
+        quic = pool.submit(_quic_handshakes, [(a, udp_port) for a in addresses], remaining, cancel_r, 'skipped')
+        # One working address is enough to pick http2
+        tcp = _handshakes([(a, tcp_port) for a in addresses], remaining, required=1, skipped='skipped')
+        if any(ms not in (None, 'skipped') for ms in tcp):
+            grace = min(QUIC_GRACE, max(0.0, deadline - time.monotonic()))
+            if not wait([quic], timeout=grace).done:
+                cancel_w.send(b'\0')
+        udp = quic.result()
+    finally:
+        pool.shutdown(wait=False)
+        cancel_r.close()
+        cancel_w.close()
+
+    for name, latencies in (('http2', tcp), ('quic', udp)):
+        result[name] = [{'address': a, 'latency_ms': None if ms == 'skipped' else ms, 'skipped': ms == 'skipped'}
+                        for a, ms in zip(addresses, latencies)]
+    if any(entry['latency_ms'] is not None for entry in result['quic']):
+        result['protocol'] = 'quic'
+    elif any(entry['latency_ms'] is not None for entry in result['http2']):
+        result['protocol'] = 'http2'
+    return _remember_edge(key, result)
+
+
+def _remember_edge(key, result):
+    with _state_lock:
+        _edge_state[key] = (copy.deepcopy(result), time.monotonic())
+    return result
+
+
+def cached_edge(hosts=EDGE_HOSTS, tcp_port=EDGE_PORT, udp_port=EDGE_PORT, max_age=EDGE_MAX_AGE):
+    """
+    Last probe_edge() result, successful or not, without probing.
+
+    Returns:
+        dict: The cached result, or None if there is none younger than max_age
+    """
+    with _state_lock:
+        cached = _edge_state.get((tuple(hosts), tcp_port, udp_port))
+    if cached and time.monotonic() - cached[1] <= max_age:
+        return copy.deepcopy(cached[0])
+    return None
+
+
 def is_online(host="8.8.8.8", port=53, timeout=3):
     """
     Check if the system is online by attempting to connect to a known host.
-    
+
     Args:
-        host (str): The host to connect to. Default is Google DNS (8.8.8.8).
+        host (str): The host to connect to, IPv4 or IPv6. Default is Google DNS (8.8.8.8).
         port (int): The port to connect to. Default is 53 (DNS).
         timeout (int): Connection timeout in seconds. Default is 3.
-    
+
     Returns:
         bool: True if online, False otherwise.
     """
     try:
-        socket.setdefaulttimeout(timeout)
-        socket.socket(socket.AF_INET, socket.SOCK_STREAM).connect((host, port))
-        return True
-    except socket.error:
+        return probe_targets([(host, port)], policy="all", timeout=timeout)
+    except OSError:
         return False
 
-def check_connection():
-    online = False
-    is_it_correct = []
-    
-    # first check google DNS
-    is_it_correct.append(is_online(host="8.8.8.8"))
-    # then check cloudflare DNS
-    is_it_correct.append(is_online(host="1.1.1.1"))
-    # finally check quad9 DNS
-    is_it_correct.append(is_online(host="9.9.9.9"))
 
-    # if any(is_it_correct): # if any check returned True
-    #     online = True
+def _state_key(policy, targets):
+    if policy == "edge":
+        return policy, tuple(targets or EDGE_HOSTS)
+    return policy, tuple(tuple(t) for t in (targets or DEFAULT_TARGETS))
 
-    if all(is_it_correct): # if all checks returned True
-        online = True
 
+def cached_connection(policy="all", targets=None, max_age=STATE_MAX_AGE):
+    """
+    Last known connectivity state, without probing.
+
+    Returns:
+        bool: The cached answer, or None if there is none younger than max_age
+    """
+    with _state_lock:
+        cached = _state.get(_state_key(policy, targets))
+    if cached and time.monotonic() - cached[1] <= max_age:
+        return cached[0]
+    return None
+
+
+def check_connection(policy="all", targets=None, timeout=DEFAULT_TIMEOUT, max_age=None):
+    """
+    Check connectivity against several public resolvers concurrently.
+
+    With policy 'edge' it checks what a tunnel needs instead (see
+    probe_edge()): online means the edge hostnames resolve and port 7844
+    answers over TCP or UDP.
+
+    Args:
+        policy: 'all' (default), 'any', k of the targets that must answer,
+            or 'edge'
+        targets: (host, port) pairs (default: 8.8.8.8, 1.1.1.1 and 9.9.9.9);
+            edge hostnames for policy 'edge' (default: EDGE_HOSTS)
+        timeout: Seconds for the whole check (not per target)
+        max_age: Return a cached answer (e.g. from ConnectivityMonitor) if it is
+            at most this many seconds old instead of probing (default: always probe)
+
+    Returns:
+        bool: True if online according to the policy
+    """
+    if max_age is not None:
+        cached = cached_connection(policy, targets, max_age)
+        if cached is not None:
+            return cached
+    try:
+        if policy == "edge":
+            online = probe_edge(targets or EDGE_HOSTS, timeout=timeout)['protocol'] is not None
+        else:
+            online = probe_targets(targets, policy, timeout)
+    except OSError:
+        online = False
+    with _state_lock:
+        _state[_state_key(policy, targets)] = (online, time.monotonic())
     return online
 
+
+class ConnectivityMonitor:
+    """
+    Keeps the cached connectivity state fresh in a daemon thread, so
+    check_connection(max_age=...) answers without blocking.
+
+    Re-probes every interval seconds with random jitter; each probe that
+    finds the same state as the last one doubles the interval, up to
+    max_interval, and any change drops it back to interval.
+
+    Usage:
+        monitor = ConnectivityMonitor()
+        monitor.start()
+        check_connection(max_age=STATE_MAX_AGE)
+    """
+
+    def __init__(self, interval=MONITOR_INTERVAL, max_interval=MONITOR_MAX_INTERVAL, jitter=MONITOR_JITTER,
+                 policy="all", targets=None, timeout=DEFAULT_TIMEOUT, on_change=None):
+        """
+        Args:
+            interval: Seconds between probes while the state is changing
+            max_interval: Longest back-off while the state is stable
+            jitter: Random +/- fraction applied to every wait
+            policy: Quorum policy passed to check_connection() ('edge'
+                keeps the edge probe fresh instead)
+            targets: (host, port) pairs passed to check_connection()
+            timeout: Probe timeout in seconds
+            on_change: Callback(online) when the state flips
+        """
+        self.interval = interval
+        self.max_interval = max_interval
+        self.jitter = jitter
+        self.policy = policy
+        self.targets = targets
+        self.timeout = timeout
+        self.on_change = on_change
+        self.online = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _run(self):
+        wait = self.interval
+        while not self._stop.is_set():
+            previous = self.online
+            self.online = check_connection(self.policy, self.targets, self.timeout)
+            if previous is None or self.online != previous:
+                wait = self.interval
+                if previous is not None and self.on_change:
+                    try:
+                        self.on_change(self.online)
+                    except Exception:
+                        pass
+            else:
+                wait = min(wait * 2, self.max_interval)
+            if self._stop.wait(wait * random.uniform(1 - self.jitter, 1 + self.jitter)):
+                break
+
+    def start(self):
+        """Start probing in a daemon thread."""
+        if self._thread and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop probing."""
+        self._stop.set()
+
+
+def get_connectivity_monitor(policy="all"):
+    """Process-wide ConnectivityMonitor for a policy with default targets, started on first use."""
+    with _state_lock:
+        if policy not in _monitors:
+            _monitors[policy] = ConnectivityMonitor(policy=policy)
+            _monitors[policy].start()
+        return _monitors[policy]
+
+
+async def _connect(host, port):
+    _, writer = await asyncio.open_connection(host, port)
+    writer.close()
+    try:
+        await writer.wait_closed()
+    except OSError:
+        pass
+
+
+async def check_connection_async(policy="all", targets=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Async variant of check_connection(); pending connects are cancelled
+    as soon as the policy is decided.
+
+    Returns:
+        bool: True if online according to the policy
+    """
+    targets = targets or DEFAULT_TARGETS
+    required = _required(policy, len(targets))
+    succeeded = failed = 0
+    pending = {asyncio.ensure_future(_connect(host, port)) for host, port in targets}
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    try:
+        while pending and succeeded < required and len(targets) - failed >= required:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                if task.exception() is None:
+                    succeeded += 1
+                else:
+                    failed += 1
+        return succeeded >= required
+    finally:
+        for task in pending:
+            task.cancel()
+        if pending:
+            await asyncio.gather(*pending, return_exceptions=True)
+
+
 if __name__ == "__main__":
     if check_connection():
         print("The system is online.")
     else:
-        print("The system is offline.")
\ No newline at end of file
+        print("The system is offline.")
@@ -0,0 +1,184 @@
+"""Chunk-level verification and Range-based repair of downloaded binaries."""
+import os
+import shutil
+import hashlib
+import requests
+from concurrent.futures import ThreadPoolExecutor
+from .downloader import CHUNK_SIZE, CONNECTIONS, ProgressReporter, get_session, select_digest
+
+WORKERS = 4
+
+
+def merkle_root(chunk_hashes):
+    """
+    Compute the Merkle root of a list of hex chunk digests.
+
+    Leaves are the raw SHA256 chunk digests; each level hashes adjacent
+    pairs together and carries an odd trailing node up unchanged.
+    """
+    level = [bytes.fromhex(h) for h in chunk_hashes]
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+
+def _valid_manifest(chunks, size):
+    """Check that a bin.json 'chunks' entry is complete and self-consistent."""
+    try:
+        chunk_size = int(chunks['size'])
+        hashes = chunks['hashes']
+        if chunk_size <= 0 or len(hashes) != (size + chunk_size - 1) // chunk_size:
+            return False
+        return merkle_root(hashes) == chunks['root']
+    except (KeyError, TypeError, ValueError):
+        return False
+
+
+def _hash_range(path, start, end):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        f.seek(start)
+        remaining = end - start
+        while remaining > 0:
+            data = f.read(min(CHUNK_SIZE, remaining))
+            if not data:
+                return None
+            digest.update(data)
+            remaining -= len(data)
+    return digest.hexdigest()
+
+
+def verify_chunks(path, chunks, size, workers=WORKERS):
+    """
+    Hash a file chunk by chunk in parallel.
+
+    Args:
+        path: File to check
+        chunks: The file's 'chunks' entry from bin.json
+        size: Expected file size
+        workers: Number of hashing threads
+
+    Returns:
+        list: Indices of chunks that are missing or do not match
+    """
+    chunk_size = int(chunks['size'])
+    hashes = chunks['hashes']
+
+    def check(index):
+        start = index * chunk_size
+        end = min(start + chunk_size, size)
+        try:
+            return _hash_range(path, start, end) == hashes[index].lower()
+        except OSError:
+            return False
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(check, range(len(hashes))))
+    return [i for i, ok in enumerate(results) if not ok]
+
+
+def _runs(indices):
+    """Group sorted chunk indices into (first, last) runs of adjacent chunks."""
+    runs = []
+    for index in indices:
+        if runs and runs[-1][1] == index - 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    return runs
+
+
+def repair_file(url, path, chunks, size, expected_sha256=None, expected_md5=None,
+                progress_callback=None, workers=WORKERS, connections=CONNECTIONS,
+                session=None, mode=None):
+    """
+    Repair a damaged copy of a binary by re-fetching only its bad chunks.
+
+    The existing file is copied to a .part file, mismatching chunks are
+    downloaded with Range requests and patched in, and the result replaces
+    path only after the whole-file digest matches. The original is never
+    modified in place, so a running tunnel keeps its binary.
+
+    Args:
+        url: Source URL of the uncompressed binary
+        path: Existing (possibly damaged) file
+        chunks: The file's 'chunks' entry from bin.json
+        size: Expected file size
+        expected_sha256: Expected whole-file SHA256 (preferred)
+        expected_md5: Expected whole-file MD5
+        progress_callback: Function(downloaded, total, percent) over re-fetched bytes
+        workers: Number of hashing threads
+        connections: Number of parallel Range requests
+        session: requests.Session to use (default: the shared session)
+        mode: Permission bits applied before the file is moved into place
+
+    Returns:
+        bool: True if the file was repaired (or already intact) and verified
+    """
+    if not size or not chunks or not _valid_manifest(chunks, size) or not os.path.isfile(path):
+        return False
+
+    part_path = path + '.part'
+    chunk_size = int(chunks['size'])
+    session = session or get_session()
+
+    try:
+        bad = verify_chunks(path, chunks, size, workers)
+        if len(bad) == len(chunks['hashes']):
+            # Nothing salvageable; a full download is cheaper
+            return False
+
+        shutil.copyfile(path, part_path)
+        with open(part_path, 'r+b') as f:
+            f.truncate(size)
+
+        runs = _runs(bad)
+        refetch = sum(min((last + 1) * chunk_size, size) - first * chunk_size for first, last in runs)
+        reporter = ProgressReporter(progress_callback, refetch)
+
+        def fetch(run):
+            start = run[0] * chunk_size
+            end = min((run[1] + 1) * chunk_size, size)
+            response = session.get(url, headers={'Range': f'bytes={start}-{end - 1}'}, stream=True, timeout=30)
+            with response:
+                if response.status_code != 206:
+                    raise IOError(f"unexpected status {response.status_code}")
+                with open(part_path, 'r+b') as f:
+                    f.seek(start)
+                    written = 0
+                    for data in response.iter_content(chunk_size=CHUNK_SIZE):
+                        data = data[:end - start - written]
+                        f.write(data)
+                        written += len(data)
+                        reporter.update(len(data))
+            if written != end - start:
+                raise IOError("short read")
+
+        with ThreadPoolExecutor(max_workers=connections) as pool:
+            list(pool.map(fetch, runs))
+
+        digest, expected = select_digest(expected_sha256, expected_md5)
+        if digest:
+            with open(part_path, 'rb') as f:
+                for data in iter(lambda: f.read(CHUNK_SIZE), b''):
+                    digest.update(data)
+            if digest.hexdigest() != expected:
+                raise IOError("digest mismatch after repair")
+        elif verify_chunks(part_path, chunks, size, workers):
+            raise IOError("chunk mismatch after repair")
+
+        if mode is not None:
+            os.chmod(part_path, mode)
+        os.replace(part_path, path)
+        return True
+    except (requests.RequestException, IOError, OSError):
+        try:
+            os.remove(part_path)
+        except OSError:
+            pass
+        return False
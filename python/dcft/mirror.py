@@ -0,0 +1,167 @@
+"""Mirror every platform's binaries into a local directory with its own bin.json.
+
+Usage:
+    python -m dcft.mirror /srv/cfmirror --workers 8
+    python -m dcft.mirror /srv/cfmirror --base-url http://mirror.lan/cf --platform linux-amd64
+
+Point clients at the mirror with DCFT_BIN_JSON=file:///srv/cfmirror/bin.json
+(or the http URL of the served directory).
+"""
+import os
+import sys
+import json
+import copy
+import argparse
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+from . import downloader
+from .bin_loader import load_bin_config, is_verified, record_verified
+
+WORKERS = 4
+
+
+def _mirror_url(dest_dir, relative, base_url=None):
+    """URL of a mirrored file: under base_url if given, else a file:// URI."""
+    if base_url:
+        return f"{base_url.rstrip('/')}/{relative}"
+    return Path(os.path.abspath(os.path.join(dest_dir, relative))).as_uri()
+
+
+def _fetch(url, path, sha256=None, md5=None, connections=1, session=None):
+    """Download one file unless a verified copy is already present."""
+    if os.path.exists(path) and is_verified(path, sha256, md5):
+        return 'skipped'
+    if downloader.download(url, path, expected_sha256=sha256, expected_md5=md5, connections=connections,
+                           session=session):
+        record_verified(path, sha256, md5)
+        return 'downloaded'
+    return 'failed'
+
+
+def _write_json(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def mirror(dest_dir, bin_json=None, platforms=None, base_url=None, workers=WORKERS,
+           include_compressed=True, connections=1, progress_callback=None, session=None):
+    """
+    Download every platform's artifacts and write a local bin.json.
+
+    Files are fetched with bounded concurrency, verified against their
+    digests, and skipped when a verified copy already exists. The written
+    bin.json mirrors the source one with every URL rewritten to the
+    mirror (base_url, or file:// paths when no base_url is given), along
+    with a release shard per platform for update checks.
+
+    Args:
+        dest_dir: Mirror directory (files go to dest_dir/binaries/<platform>/)
+        bin_json: Source manifest URL (default: BIN_JSON)
+        platforms: Platform keys to mirror (default: all)
+        base_url: URL under which dest_dir will be served
+        workers: Number of files fetched concurrently
+        include_compressed: Also mirror the compressed variants
+        connections: Range connections per file
+        progress_callback: Function(filename, status) called as each file finishes
+        session: requests.Session to use (default: the shared pooled session)
+
+    Returns:
+        dict: {'downloaded': [...], 'skipped': [...], 'failed': [...], 'bin_json': path}
+            or None if the source manifest could not be loaded
+    """
+    config = load_bin_config(url=bin_json, session=session)
+    if not config or 'platforms' not in config:
+        return None
+
+    local = copy.deepcopy(config)
+    local['platforms'] = {}
+    jobs = []
+
+    for platform_key, platform_data in sorted(config['platforms'].items()):
+        if platforms and platform_key not in platforms:
+            continue
+        local_data = copy.deepcopy(platform_data)
+        for file_info in local_data.get('files', []):
+            filename = file_info.get('filename')
+            if not filename or not file_info.get('url'):
+                continue
+            relative = f"binaries/{platform_key}/{filename}"
+            jobs.append((file_info['url'], os.path.join(dest_dir, relative),
+                         file_info.get('sha256'), file_info.get('md5')))
+            file_info['url'] = _mirror_url(dest_dir, relative, base_url)
+
+            variant = file_info.get('compressed')
+            if variant and include_compressed and variant.get('url') and variant.get('filename'):
+                relative = f"binaries/{platform_key}/{variant['filename']}"
+                jobs.append((variant['url'], os.path.join(dest_dir, relative), variant.get('sha256'), None))
+                variant['url'] = _mirror_url(dest_dir, relative, base_url)
+            elif variant:
+                del file_info['compressed']
+        local['platforms'][platform_key] = local_data
+
+    summary = {'downloaded': [], 'skipped': [], 'failed': []}
+
+    def run(job):
+        url, path, sha256, md5 = job
+        status = _fetch(url, path, sha256, md5, connections, session)
+        if progress_callback:
+            progress_callback(os.path.basename(path), status)
+        return path, status
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for path, status in pool.map(run, jobs):
+            summary[status].append(path)
+
+    manifest_path = os.path.join(dest_dir, 'bin.json')
+    _write_json(manifest_path, local)
+
+    # Per-platform release shards, so update checks also work against the mirror
+    for platform_key, platform_data in local['platforms'].items():
+        _write_json(os.path.join(dest_dir, 'releases', f"{platform_key}.json"), {
+            'version': local.get('version'),
+            'platform': platform_key,
+            'files': platform_data.get('files', [])
+        })
+
+    summary['bin_json'] = manifest_path
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dcft.mirror",
+                                     description="Mirror cloudflared binaries for offline hosts")
+    parser.add_argument('dest', help="mirror directory")
+    parser.add_argument('--bin-json', default=None, help="source bin.json URL (http(s):// or file://)")
+    parser.add_argument('--platform', action='append', dest='platforms', help="platform key (repeatable)")
+    parser.add_argument('--base-url', default=None, help="URL the mirror directory will be served from")
+    parser.add_argument('--workers', type=int, default=WORKERS, help="concurrent downloads")
+    parser.add_argument('--no-compressed', action='store_true', help="skip compressed variants")
+    args = parser.parse_args(argv)
+
+    def report(filename, status):
+        print(f"[MIRROR] {status:10} {filename}", flush=True)
+
+    summary = mirror(
+        args.dest,
+        bin_json=args.bin_json,
+        platforms=args.platforms,
+        base_url=args.base_url,
+        workers=args.workers,
+        include_compressed=not args.no_compressed,
+        progress_callback=report
+    )
+    if summary is None:
+        print("[MIRROR] Failed to load bin.json")
+        return 1
+
+    print(f"[MIRROR] {len(summary['downloaded'])} downloaded, {len(summary['skipped'])} skipped, "
+          f"{len(summary['failed'])} failed")
+    print(f"[MIRROR] Manifest: {summary['bin_json']}")
+    return 1 if summary['failed'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,189 @@
+"""Background monitoring of VPN and internet state with change events."""
+import os
+import json
+import time
+import threading
+from .is_online import check_connection
+from .vpn_snapshot import SystemSnapshot
+from .vpn_detect import (
+    SNAPSHOT_METHODS,
+    VPNDetector,
+    add_network_listener,
+    invalidate_vpn_cache,
+    remove_network_listener,
+)
+
+MONITOR_INTERVAL = 15.0
+# Fraction of one CPU core the monitor may use on average
+CPU_BUDGET = 0.02
+# Delay between a netlink message and the early check it triggers
+WAKE_DEBOUNCE = 1.0
+
+EVENTS = ('vpn_up', 'vpn_down', 'online', 'offline')
+
+
+class NetworkMonitor:
+    """
+    Periodically re-evaluates VPN and internet state and emits an event
+    whenever either one changes.
+
+    Each check reads a fresh system snapshot and reruns the cheap local
+    checks; the network probes (gateway, public IP, traceroute, latency)
+    only run again when the routing table or default gateway changed.
+    On Linux a netlink listener wakes the monitor shortly after links or
+    routes change (WAKE_DEBOUNCE later, so a burst of messages costs one
+    check) instead of waiting for the next interval.
+
+    Usage:
+        monitor = NetworkMonitor(interval=10)
+        monitor.subscribe(lambda event, status: print(event))
+        monitor.start()
+        ...
+        monitor.stop()
+    """
+
+    def __init__(self, interval=MONITOR_INTERVAL, check_internet=True, check_vpn=True,
+                 cpu_budget=CPU_BUDGET):
+        """
+        Args:
+            interval: Seconds between checks
+            check_internet: Watch internet connectivity
+            check_vpn: Watch VPN state
+            cpu_budget: Average share of one CPU core the checks may use;
+                the interval is stretched when a check costs more
+        """
+        self.interval = interval
+        self.check_internet = check_internet
+        self.check_vpn = check_vpn
+        self.cpu_budget = cpu_budget
+        self.status = None
+        self._subscribers = []
+        self._probes = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def subscribe(self, callback):
+        """Register callback(event, status); event is one of EVENTS."""
+        with self._lock:
+            self._subscribers.append(callback)
+
+    def unsubscribe(self, callback):
+        """Remove a callback registered with subscribe()."""
+        with self._lock:
+            if callback in self._subscribers:
+                self._subscribers.remove(callback)
+
+    def _check_vpn(self):
+        snapshot = SystemSnapshot()
+        fingerprint = json.dumps([snapshot.get('routes'), snapshot.default_gateway()], sort_keys=True)
+        reuse = None
+        if self._probes is not None and fingerprint == self._fingerprint:
+            reuse = self._probes
+        results = VPNDetector(snapshot=snapshot).detect_all(reuse=reuse)
+        self._fingerprint = fingerprint
+        self._probes = {name: detected for name, detected in results['methods'].items()
+                        if name not in SNAPSHOT_METHODS}
+        return results
+
+    def check_now(self):
+        """
+        Check once and emit events for anything that changed.
+
+        Returns:
+            dict: Status with 'internet', 'vpn' and 'vpn_details'
+        """
+        status = {'internet': True, 'vpn': False, 'vpn_details': None}
+        if self.check_internet:
+            status['internet'] = check_connection()
+        if self.check_vpn:
+            details = self._check_vpn()
+            status['vpn'] = details['vpn_detected']
+            if status['vpn']:
+                status['vpn_details'] = details
+
+        previous, self.status = self.status, status
+        if previous is None:
+            return status
+
+        events = []
+        if status['vpn'] != previous['vpn']:
+            events.append('vpn_up' if status['vpn'] else 'vpn_down')
+            # The process-wide verdict is out of date now
+            invalidate_vpn_cache()
+        if status['internet'] != previous['internet']:
+            events.append('online' if status['internet'] else 'offline')
+
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for event in events:
+            for callback in subscribers:
+                try:
+                    callback(event, status)
+                except Exception:
+                    pass
+        return status
+
+    @staticmethod
+    def _cpu_time():
+        # The whole process plus reaped child processes (ip, ipconfig,
+        # tasklist...), so probes in detector and check_connection worker
+        # threads count too. Other application threads running during the
+        # check are charged as well; checks are short and over-counting only
+        # stretches the interval, so that errs on the side of the budget.
+        times = os.times()
+        return time.process_time() + times.children_user + times.children_system
+
+    def _run(self, stop):
+        while not stop.is_set():
+            started = self._cpu_time()
+            try:
+                self.check_now()
+            except Exception:
+                pass
+            # Stretch the gap so the checks stay within the CPU budget
+            used = self._cpu_time() - started
+            gap = used / self.cpu_budget if self.cpu_budget else 0.0
+            finished = time.monotonic()
+            due = finished + max(self.interval, gap)
+            while not stop.is_set():
+                remaining = due - time.monotonic()
+                if remaining <= 0:
+                    break
+                if self._wake.wait(remaining):
+                    self._wake.clear()
+                    # Check early, WAKE_DEBOUNCE after the first message so a
+                    # burst of link/route messages costs one check, but never
+                    # sooner than the budgeted gap
+                    due = min(due, max(finished + gap, time.monotonic() + WAKE_DEBOUNCE))
+
+    def start(self, baseline=None):
+        """
+        Start monitoring in a daemon thread.
+
+        Args:
+            baseline: Known status to compare the first check against
+                (e.g. TunnelRunner.health_status); without it the first
+                check only records the state
+        """
+        if self._thread and self._thread.is_alive() and not self._stop.is_set():
+            return
+        if baseline is not None:
+            self.status = {'internet': baseline.get('internet', True), 'vpn': baseline.get('vpn', False),
+                           'vpn_details': baseline.get('vpn_details')}
+        # A fresh event per run: a stopped thread still inside check_now()
+        # exits on its own event instead of blocking this start
+        self._stop = threading.Event()
+        self._wake.clear()
+        add_network_listener(self._wake.set)
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop monitoring."""
+        remove_network_listener(self._wake.set)
+        self._stop.set()
+        self._wake.set()
+        self._thread = None
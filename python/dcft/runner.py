@@ -2,8 +2,17 @@
 import sys
 import os
 from .bin_loader import get_bin
-from .is_online import check_connection
-from .vpn_detect import is_vpn_connected, get_vpn_details
+from .is_online import (
+    check_connection,
+    cached_edge,
+    get_connectivity_monitor,
+    probe_edge,
+    EDGE_MAX_AGE,
+    STATE_MAX_AGE,
+)
+from .vpn_detect import get_vpn_details
+from .updater import BackgroundUpdater, CHECK_INTERVAL
+from .monitor import NetworkMonitor, MONITOR_INTERVAL
 from . import tunnel
 
 
@@ -31,7 +40,14 @@ class TunnelRunner:
         check_internet=True,
         check_vpn=True,
         progress_callback=None,
-        url_callback=None
+        url_callback=None,
+        deep_verify=False,
+        update_interval=CHECK_INTERVAL,
+        monitor=False,
+        monitor_interval=MONITOR_INTERVAL,
+        network_callback=None,
+        network_action=None,
+        protocol="http2"
     ):
         """
         Initialize tunnel runner.
@@ -42,13 +58,25 @@ class TunnelRunner:
             debug: Debug mode (default: True)
             auto_download: Auto download binary on init (default: True)
             force_download: Force re-download binary (default: False)
-            update: Check for binary updates (default: False)
+            update: Check for binary updates in the background (default: False)
             bin_dir: Custom binary directory (default: None)
             binary_path: Direct path to binary (skips download)
-            check_internet: Check internet before start (default: True)
+            check_internet: Check before start that the Cloudflare edge resolves
+                and answers on port 7844 (default: True)
             check_vpn: Check VPN before start (default: True)
             progress_callback: Download progress callback(downloaded, total, percent)
             url_callback: URL found callback(url)
+            deep_verify: Re-hash an existing binary on init (default: False)
+            update_interval: Seconds between background update checks (default: 6h)
+            monitor: Keep watching VPN/internet state while running (default: False)
+            monitor_interval: Seconds between monitor checks (default: 15)
+            network_callback: Network change callback(event, status), event is
+                'vpn_up', 'vpn_down', 'online' or 'offline'
+            network_action: What to do when the network becomes unhealthy:
+                None (only report), 'stop', or 'restart' (stop, then start
+                again once healthy)
+            protocol: Edge protocol: 'http2', 'quic' or 'auto' (probe the
+                Cloudflare edge and pick quic or http2) (default: http2)
         """
         self.port = port
         self.timeout = timeout
@@ -57,11 +85,16 @@ class TunnelRunner:
         self.check_vpn = check_vpn
         self.progress_callback = progress_callback
         self.url_callback = url_callback
+        self.network_callback = network_callback
+        self.network_action = network_action
+        self.requested_protocol = protocol
         
         # State variables
         self.url = None
+        self.ready = False
         self.running = False
         self.binary_path = binary_path
+        self.protocol = None
         self.health_status = {}
         
         # Internal handles
@@ -69,6 +102,9 @@ class TunnelRunner:
         self._process_handle = None
         self._running_flag = None
         self._reader_thread = None
+        self._updater = None
+        self._monitor = None
+        self._paused = False
         
         # Auto-download binary if needed
         if auto_download and not binary_path:
@@ -76,9 +112,26 @@ class TunnelRunner:
                 bin_dir=bin_dir,
                 debug=debug,
                 force_download=force_download,
-                update=update,
-                progress_callback=progress_callback
+                progress_callback=progress_callback,
+                deep_verify=deep_verify
             )
+        
+        # Updates are fetched in the background and applied on restart()
+        if update and auto_download and self.binary_path:
+            self._updater = BackgroundUpdater(self.binary_path, interval=update_interval)
+            self._updater.start()
+        
+        # Keep the edge reachability warm so start() and restart() don't block on probes
+        if check_internet:
+            get_connectivity_monitor(policy="edge")
+        
+        if monitor:
+            self._monitor = NetworkMonitor(
+                interval=monitor_interval,
+                check_internet=check_internet,
+                check_vpn=check_vpn
+            )
+            self._monitor.subscribe(self._network_event)
     
     def _health_check(self):
         """Run health checks."""
@@ -88,27 +141,65 @@ class TunnelRunner:
             'vpn_details': None
         }
         
-        # Check internet
+        # Check internet: the edge hostnames resolve and 7844 answers over TCP or UDP
         if self.check_internet:
-            self.health_status['internet'] = check_connection()
+            # Answered from the background monitor's state when it is recent
+            self.health_status['internet'] = check_connection(policy="edge", max_age=STATE_MAX_AGE)
             if not self.health_status['internet']:
+                # cloudflared couldn't connect either, so don't start it
+                self.health_status['edge'] = cached_edge(max_age=STATE_MAX_AGE)
                 return False
         
         # Check VPN
         if self.check_vpn:
-            self.health_status['vpn'] = is_vpn_connected()
+            # One (cached) detection run serves both the verdict and the details
+            details = get_vpn_details()
+            self.health_status['vpn'] = details['vpn_detected']
             if self.health_status['vpn']:
-                self.health_status['vpn_details'] = get_vpn_details()
+                self.health_status['vpn_details'] = details
                 return False
         
+        # Pick the edge protocol from what the network lets through
+        self.protocol = self.requested_protocol
+        if self.protocol == 'auto':
+            self.protocol = 'http2'
+            if self.check_internet:
+                # Reuses the verdict behind the check above, so this rarely probes
+                edge = probe_edge(max_age=EDGE_MAX_AGE)
+                self.health_status['edge'] = edge
+                if not edge['protocol']:
+                    self.health_status['internet'] = False
+                    return False
+                self.protocol = edge['protocol']
+        
         return True
     
+    def _network_event(self, event, status):
+        """Internal callback for NetworkMonitor events."""
+        self.health_status = status
+        if self.network_callback:
+            self.network_callback(event, status)
+        
+        healthy = status['internet'] and not status['vpn']
+        if not healthy and self.running and self.network_action in ('stop', 'restart'):
+            self._stop_tunnel()
+            self._paused = self.network_action == 'restart'
+        elif healthy and self._paused:
+            self._paused = not self.start()
+    
     def _url_found_callback(self, url):
         """Internal callback when URL is captured."""
         self.url = url
         if self.url_callback:
             self.url_callback(url)
     
+    def _tunnel_event(self, kind, value):
+        """Internal callback for tunnel events (metrics readiness, log lines)."""
+        if kind in ('ready', 'connected'):
+            self.ready = True
+        elif kind == 'closed':
+            self.ready = False
+    
     def start(self):
         """
         Start the tunnel.
@@ -119,6 +210,9 @@ class TunnelRunner:
         if self.running:
             return False
         
+        if self._updater:
+            self._updater.start()
+        
         if not self.binary_path or not os.path.exists(self.binary_path):
             return False
         
@@ -136,11 +230,14 @@ class TunnelRunner:
                     self.binary_path,
                     self.port,
                     self.timeout,
-                    self._url_found_callback
+                    self._url_found_callback,
+                    protocol=self.protocol,
+                    event_callback=self._tunnel_event
                 )
             
             if self.url:
                 self.running = True
+                self._start_monitor()
                 return True
             return False
         else:
@@ -149,16 +246,32 @@ class TunnelRunner:
                 self.binary_path,
                 self.port,
                 self.timeout,
-                self._url_found_callback
+                self._url_found_callback,
+                protocol=self.protocol,
+                event_callback=self._tunnel_event
             )
             
             if self.url:
                 self.running = True
+                self._start_monitor()
                 return True
             return False
     
+    def _start_monitor(self):
+        if self._monitor:
+            self._monitor.start(baseline=self.health_status)
+    
     def stop(self):
         """Stop the tunnel."""
+        self._paused = False
+        if self._monitor:
+            self._monitor.stop()
+        if self._updater:
+            self._updater.stop()
+        self._stop_tunnel()
+    
+    def _stop_tunnel(self):
+        """Stop the tunnel process/DLL, leaving the monitor running."""
         if not self.running:
             return
         
@@ -174,11 +287,14 @@ class TunnelRunner:
             self._process_handle = None
         
         self.running = False
+        self.ready = False
         self.url = None
     
     def restart(self):
-        """Restart the tunnel."""
+        """Restart the tunnel, switching to a staged binary update if one is ready."""
         self.stop()
+        if self._updater:
+            self._updater.apply()
         return self.start()
     
     def get_status(self):
@@ -191,11 +307,19 @@ class TunnelRunner:
         status = {
             'running': self.running,
             'url': self.url,
+            'ready': self.ready,
             'port': self.port,
+            'protocol': self.protocol,
             'binary': self.binary_path,
             'health': self.health_status
         }
         
+        if self._updater and self._updater.staged:
+            status['update_staged'] = self._updater.staged.get('version') or self._updater.staged.get('build')
+        
+        if self._paused:
+            status['paused'] = True
+        
         # Check if process is alive
         if self._process_handle and self.running:
             status['process_alive'] = self._process_handle.poll() is None
@@ -0,0 +1,205 @@
+"""Content-addressed binary store shared by every bin_dir on the host."""
+import os
+import re
+import json
+import time
+import shutil
+from .filelock import FileLock
+
+STORE_DIR = os.path.join(os.path.expanduser("~"), ".cfbin", "store")
+INDEX_FILE = "index.json"
+BLOB_NAME = re.compile(r'^[0-9a-f]{64}$')
+
+
+def blob_path(sha256, store_dir=None):
+    """Return the store path of the blob with the given SHA256."""
+    sha256 = sha256.lower()
+    return os.path.join(store_dir or STORE_DIR, "sha256", sha256[:2], sha256)
+
+
+def _index_lock(store_dir):
+    return FileLock(os.path.join(store_dir, ".index.lock"))
+
+
+def load_index(store_dir=None):
+    """Load the store index ({sha256: {size, added, last_used, symlinks}})."""
+    try:
+        with open(os.path.join(store_dir or STORE_DIR, INDEX_FILE), 'r') as f:
+            index = json.load(f)
+        return index if isinstance(index, dict) else {}
+    except:
+        return {}
+
+
+def _save_index(store_dir, index):
+    index_path = os.path.join(store_dir, INDEX_FILE)
+    tmp_path = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w') as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp_path, index_path)
+
+
+def _touch(index, sha256, path, symlink=None):
+    now = time.time()
+    entry = index.setdefault(sha256.lower(), {'added': now})
+    entry['size'] = os.path.getsize(path)
+    entry['last_used'] = now
+    if symlink:
+        links = entry.setdefault('symlinks', [])
+        if symlink not in links:
+            links.append(symlink)
+
+
+def _walk_blobs(store_dir):
+    """SHA256 digests of every blob file under the store, indexed or not."""
+    for root, _, files in os.walk(os.path.join(store_dir, "sha256")):
+        for name in files:
+            if BLOB_NAME.match(name):
+                yield name
+
+
+def _symlinked(entry, path):
+    """Recorded symlinks that still point at the blob (stale ones are dropped)."""
+    target = os.path.realpath(path)
+    links = [link for link in entry.get('symlinks', [])
+             if os.path.islink(link) and os.path.realpath(link) == target]
+    if links:
+        entry['symlinks'] = links
+    else:
+        entry.pop('symlinks', None)
+    return links
+
+
+def mark_used(sha256, store_dir=None):
+    """Record that the blob was just added or linked."""
+    store_dir = store_dir or STORE_DIR
+    path = blob_path(sha256, store_dir)
+    try:
+        with _index_lock(store_dir):
+            index = load_index(store_dir)
+            _touch(index, sha256, path)
+            _save_index(store_dir, index)
+    except OSError:
+        pass
+
+
+def link_into(sha256, dest_path, store_dir=None):
+    """
+    Expose a stored blob at dest_path.
+
+    Tries a hardlink first, then a symlink, then a plain copy, and swaps
+    the result into place with os.replace. Runs under the index lock so
+    prune() can't remove the blob midway, and records symlinks in the
+    index so prune() knows the blob is still in use.
+
+    Returns:
+        str: 'hardlink', 'symlink' or 'copy', or None if it failed
+    """
+    store_dir = store_dir or STORE_DIR
+    src = blob_path(sha256, store_dir)
+    tmp_path = f"{dest_path}.{os.getpid()}.link"
+    os.makedirs(os.path.dirname(dest_path) or '.', exist_ok=True)
+
+    with _index_lock(store_dir):
+        if not os.path.isfile(src):
+            return None
+        for method in ('hardlink', 'symlink', 'copy'):
+            try:
+                if os.path.lexists(tmp_path):
+                    os.remove(tmp_path)
+                if method == 'hardlink':
+                    if os.path.exists(dest_path) and os.path.samefile(src, dest_path):
+                        return method
+                    os.link(src, tmp_path)
+                elif method == 'symlink':
+                    os.symlink(os.path.abspath(src), tmp_path)
+                else:
+                    shutil.copy2(src, tmp_path)
+                os.replace(tmp_path, dest_path)
+            except OSError:
+                continue
+            try:
+                index = load_index(store_dir)
+                symlink = os.path.abspath(dest_path) if method == 'symlink' else None
+                _touch(index, sha256, src, symlink)
+                _save_index(store_dir, index)
+            except OSError:
+                pass
+            return method
+    return None
+
+
+def prune(store_dir=None, max_bytes=None, max_age=None, keep=()):
+    """
+    Evict blobs from the store.
+
+    Blobs unused for longer than max_age seconds are removed first, then
+    the least recently used ones until the store fits in max_bytes. Blob
+    files missing from the index (an interrupted link_into, an older
+    version) count towards max_bytes and are the first to go; a blob that
+    is still being downloaded (its .lock held) is left alone.
+    Blobs still hardlinked from a bin_dir are only evicted when nothing
+    else can be; the hardlinked copies stay intact. Blobs a bin_dir
+    symlinks to are never evicted, since that would leave the link
+    dangling.
+
+    Args:
+        store_dir: Store directory (default: ~/.cfbin/store)
+        max_bytes: Maximum total size of the store
+        max_age: Maximum seconds since a blob was last used
+        keep: SHA256 digests that must not be evicted
+
+    Returns:
+        list: SHA256 digests that were removed
+    """
+    store_dir = store_dir or STORE_DIR
+    keep = {k.lower() for k in keep}
+    removed = []
+    if not os.path.isdir(store_dir):
+        return removed
+
+    with _index_lock(store_dir):
+        index = load_index(store_dir)
+        blobs = []
+        for sha256 in set(index) | set(_walk_blobs(store_dir)):
+            path = blob_path(sha256, store_dir)
+            try:
+                st = os.stat(path)
+            except OSError:
+                index.pop(sha256, None)
+                continue
+            entry = index.get(sha256)
+            # Unindexed blobs sort before everything that was ever used
+            last_used = 0 if entry is None else entry.get('last_used', st.st_mtime)
+            entry = entry or {}
+            symlinked = bool(_symlinked(entry, path))
+            blobs.append((st.st_nlink > 1, last_used, sha256, st.st_size, path, symlinked))
+
+        now = time.time()
+        total = sum(b[3] for b in blobs)
+        # Unreferenced blobs first, oldest first
+        for referenced, last_used, sha256, size, path, symlinked in sorted(blobs):
+            if sha256 in keep or symlinked:
+                continue
+            too_old = max_age is not None and now - last_used > max_age
+            too_big = max_bytes is not None and total > max_bytes
+            if not (too_old or too_big):
+                continue
+            # Skip a blob another process is downloading or linking right now
+            lock = FileLock(path + '.lock', timeout=0)
+            try:
+                lock.acquire()
+            except (TimeoutError, OSError):
+                continue
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            finally:
+                lock.release()
+            index.pop(sha256, None)
+            total -= size
+            removed.append(sha256)
+
+        _save_index(store_dir, index)
+    return removed
@@ -3,14 +3,140 @@ import ctypes
 import ctypes.wintypes
 import sys
 import os
+import json
 import time
+import socket
 import threading
-import re
 import subprocess
 import signal
+import http.client
+from .tunnel_io import get_output_loop
 
+METRICS_HOST = "127.0.0.1"
+METRICS_REQUEST_TIMEOUT = 1
+# Metrics polling starts fast and backs off while cloudflared starts up
+METRICS_POLL_MIN = 0.05
+METRICS_POLL_MAX = 0.5
 
-def start_tunnel_dll(dll_path, port, timeout, url_callback=None):
+
+class _Capture:
+    """URL and readiness of a starting tunnel, from its logs or its metrics server."""
+
+    def __init__(self, url_callback=None, event_callback=None):
+        self.url = None
+        self.ready = False
+        self.url_found = threading.Event()
+        self.wake = threading.Event()
+        self.url_callback = url_callback
+        self.event_callback = event_callback
+        self._lock = threading.Lock()
+
+    def handle(self, kind, value):
+        """OutputLoop handler; the metrics poller reports through it too."""
+        with self._lock:
+            if kind == 'url':
+                if self.url is not None:
+                    return
+                self.url = value
+            elif kind == 'ready':
+                if self.ready:
+                    return
+                self.ready = True
+            elif kind == 'connected':
+                self.ready = True
+        if kind == 'url':
+            if self.url_callback:
+                self.url_callback(value)
+            self.url_found.set()
+        self.wake.set()
+        if self.event_callback:
+            self.event_callback(kind, value)
+
+
+def _free_port():
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind((METRICS_HOST, 0))
+        return sock.getsockname()[1]
+
+
+def read_metrics(port, path, timeout=METRICS_REQUEST_TIMEOUT):
+    """
+    GET an endpoint of cloudflared's metrics server.
+    
+    Args:
+        port: Metrics server port on 127.0.0.1
+        path: Endpoint, e.g. '/quicktunnel' or '/ready'
+        timeout: Request timeout in seconds
+    
+    Returns:
+        tuple: (status, data) with data the decoded JSON body or None;
+            (None, None) if the server is not reachable
+    """
+    try:
+        conn = http.client.HTTPConnection(METRICS_HOST, port, timeout=timeout)
+        try:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            status, body = response.status, response.read()
+        finally:
+            conn.close()
+    except:
+        return None, None
+    try:
+        return status, json.loads(body)
+    except:
+        return status, None
+
+
+def poll_metrics(port, capture, timeout, process=None):
+    """
+    Poll /quicktunnel and /ready until the tunnel has a URL and is ready.
+    
+    The interval grows by half per poll from METRICS_POLL_MIN up to
+    METRICS_POLL_MAX. A log event (URL or registered connection) cuts the
+    wait short, so log scraping still works when the metrics server is
+    unavailable.
+    
+    Args:
+        port: Metrics server port
+        capture: _Capture that receives 'url' and 'ready' events
+        timeout: Seconds to keep polling
+        process: Stop early if this process exits
+    
+    Returns:
+        bool: True once the tunnel is ready (or readiness can't be queried
+            and the URL is known)
+    """
+    deadline = time.monotonic() + timeout
+    interval = METRICS_POLL_MIN
+    while True:
+        if capture.url is None:
+            status, data = read_metrics(port, "/quicktunnel")
+            hostname = data.get('hostname') if status == 200 and isinstance(data, dict) else None
+            if hostname:
+                capture.handle('url', f"https://{hostname}")
+        if capture.url is not None:
+            if capture.ready:
+                return True
+            status, data = read_metrics(port, "/ready")
+            if status == 200:
+                connections = data.get('readyConnections') if isinstance(data, dict) else None
+                capture.handle('ready', connections)
+                return True
+            if status is None or status == 404:
+                # No metrics server or no /ready: the URL is all we get
+                return True
+        if process is not None and process.poll() is not None:
+            return False
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            return False
+        capture.wake.wait(min(interval, remaining))
+        capture.wake.clear()
+        interval = min(interval * 1.5, METRICS_POLL_MAX)
+
+
+def start_tunnel_dll(dll_path, port, timeout, url_callback=None, protocol="http2", event_callback=None):
     """
     Start tunnel using Windows DLL with pipe capture.
     
@@ -19,9 +145,13 @@ def start_tunnel_dll(dll_path, port, timeout, url_callback=None):
         port: Local port to tunnel
         timeout: Timeout in seconds
         url_callback: Callback function(url) when URL is found
+        protocol: Edge protocol: 'http2', 'quic' or 'auto' (default: http2)
+        event_callback: Callback function(kind, value) for every parsed
+            log event ('url', 'connected', 'closed')
     
     Returns:
-        tuple: (lib_handle, url, reader_thread, running_flag)
+        tuple: (lib_handle, url, None, running_flag); output is read by
+            the shared OutputLoop, so there is no reader thread to return
     """
     kernel32 = ctypes.windll.kernel32
     
@@ -64,43 +194,19 @@ def start_tunnel_dll(dll_path, port, timeout, url_callback=None):
     except:
         return None, None, None, None
     
-    # URL capture
-    url_pattern = re.compile(r'https://[a-z0-9\-]+\.trycloudflare\.com')
-    url_found = threading.Event()
-    captured_url = [None]
+    # URL capture through the shared output loop
+    capture = _Capture(url_callback, event_callback)
     running_flag = [True]
-    
-    def reader():
-        buffer = ctypes.create_string_buffer(4096)
-        bytes_read = ctypes.wintypes.DWORD()
-        collected = ""
-        
-        while running_flag[0]:
-            success = kernel32.ReadFile(
-                read_handle,
-                buffer,
-                4096,
-                ctypes.byref(bytes_read),
-                None
-            )
-            if success and bytes_read.value > 0:
-                text = buffer.raw[:bytes_read.value].decode('utf-8', errors='ignore')
-                collected += text
-                match = url_pattern.search(collected)
-                if match and not captured_url[0]:
-                    captured_url[0] = match.group(0)
-                    if url_callback:
-                        url_callback(captured_url[0])
-                    url_found.set()
-            else:
-                time.sleep(0.1)
-    
-    read_thread = threading.Thread(target=reader, daemon=True)
-    read_thread.start()
+    try:
+        import msvcrt as ms
+        read_fd = ms.open_osfhandle(read_handle.value, os.O_RDONLY)
+    except:
+        return None, None, None, None
+    get_output_loop().register(lib, [read_fd], capture.handle)
     
     # Run tunnel
     def run():
-        args = f"cloudflared tunnel --url http://localhost:{port} --protocol http2"
+        args = f"cloudflared tunnel --url http://localhost:{port} --protocol {protocol}"
         try:
             lib.CloudflaredRun(args.encode())
         except:
@@ -110,36 +216,52 @@ def start_tunnel_dll(dll_path, port, timeout, url_callback=None):
     run_thread.start()
     
     # Wait for URL
-    if url_found.wait(timeout=timeout):
+    if capture.url_found.wait(timeout=timeout):
         # Silence output
         nul = kernel32.CreateFileW("NUL", 0x40000000, 3, None, 3, 0, None)
         kernel32.SetStdHandle(STD_OUTPUT_HANDLE, nul)
         kernel32.SetStdHandle(STD_ERROR_HANDLE, nul)
-        return lib, captured_url[0], read_thread, running_flag
+        return lib, capture.url, None, running_flag
     
     running_flag[0] = False
-    return lib, None, read_thread, running_flag
+    return lib, None, None, running_flag
 
 
-def start_tunnel_subprocess(binary_path, port, timeout, url_callback=None):
+def start_tunnel_subprocess(binary_path, port, timeout, url_callback=None, protocol="http2",
+                            event_callback=None, metrics_port=None):
     """
     Start tunnel using subprocess.
     
+    The URL and ready state come from cloudflared's metrics server
+    (/quicktunnel and /ready), which also works for custom quick-service
+    hosts; matching the URL in the log output is the fallback. Returns as
+    soon as the URL is known; readiness arrives later as a 'ready' event.
+    
     Args:
         binary_path: Path to cloudflared binary
         port: Local port to tunnel
         timeout: Timeout in seconds
         url_callback: Callback function(url) when URL is found
+        protocol: Edge protocol: 'http2', 'quic' or 'auto' (default: http2)
+        event_callback: Callback function(kind, value) for every event
+            ('url', 'ready', 'connected', 'closed')
+        metrics_port: Port for the metrics server (default: a free one)
     
     Returns:
         tuple: (process, url)
     """
+    try:
+        metrics_port = metrics_port or _free_port()
+    except:
+        metrics_port = None
     cmd = [
         binary_path,
         "tunnel",
         "--url", f"http://localhost:{port}",
-        "--protocol", "http2"
+        "--protocol", protocol
     ]
+    if metrics_port:
+        cmd += ["--metrics", f"{METRICS_HOST}:{metrics_port}"]
     
     try:
         creationflags = 0
@@ -150,39 +272,21 @@ def start_tunnel_subprocess(binary_path, port, timeout, url_callback=None):
             cmd,
             stdout=subprocess.PIPE,
             stderr=subprocess.PIPE,
-            text=True,
-            bufsize=1,
-            universal_newlines=True,
+            bufsize=0,
             creationflags=creationflags
         )
         
-        url_found = threading.Event()
-        captured_url = [None]
-        url_pattern = re.compile(r'https://[a-z0-9\-]+\.trycloudflare\.com')
-        
-        def monitor():
-            try:
-                for line in process.stderr:
-                    match = url_pattern.search(line)
-                    if match and not captured_url[0]:
-                        captured_url[0] = match.group(0)
-                        if url_callback:
-                            url_callback(captured_url[0])
-                        url_found.set()
-                        break
-                # Continue consuming silently
-                for line in process.stderr:
-                    pass
-            except:
-                pass
-        
-        monitor_thread = threading.Thread(target=monitor, daemon=True)
-        monitor_thread.start()
-        
-        if url_found.wait(timeout=timeout):
-            return process, captured_url[0]
+        capture = _Capture(url_callback, event_callback)
+        # Both pipes are drained for the life of the process so neither fills
+        get_output_loop().register(process, [process.stdout, process.stderr], capture.handle)
         
-        return process, None
+        if metrics_port:
+            # Keeps polling /ready after the URL is known; readiness is
+            # reported as a 'ready' event, not awaited here
+            threading.Thread(target=poll_metrics, args=(metrics_port, capture, timeout, process),
+                             daemon=True).start()
+        capture.url_found.wait(timeout=timeout)
+        return process, capture.url
         
     except:
         return None, None
@@ -194,6 +298,7 @@ def stop_tunnel_dll(lib_handle, running_flag):
         running_flag[0] = False
     
     if lib_handle:
+        get_output_loop().unregister(lib_handle)
         try:
             lib_handle.CloudflaredStop()
         except:
@@ -205,6 +310,7 @@ def stop_tunnel_subprocess(process):
     if not process:
         return
     
+    get_output_loop().unregister(process)
     try:
         if sys.platform == "win32":
             process.send_signal(signal.CTRL_BREAK_EVENT)
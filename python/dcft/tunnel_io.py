@@ -0,0 +1,177 @@
+"""Shared I/O loop for the output of every managed tunnel."""
+import os
+import sys
+import selectors
+import threading
+from .logparse import TunnelLogParser
+
+READ_SIZE = 65536
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _fileno(pipe):
+    return pipe if isinstance(pipe, int) else pipe.fileno()
+
+
+class OutputLoop:
+    """
+    One thread that reads stdout and stderr of every managed tunnel.
+
+    Each tunnel registers its pipes with a handler. The loop sleeps in
+    select() and wakes as soon as any pipe has data, feeds it to that
+    pipe's TunnelLogParser and calls handler(kind, value) for every event
+    ('url' only once per tunnel). When all of a tunnel's pipes reach EOF
+    the handler gets ('closed', None) and the tunnel is dropped.
+
+    Windows can't select() on pipes, so there each pipe gets a reader
+    thread blocked in read() that feeds the same dispatch path.
+
+    Usage:
+        loop = get_output_loop()
+        loop.register(process, [process.stdout, process.stderr], handler)
+        ...
+        loop.unregister(process)
+    """
+
+    def __init__(self, use_select=None):
+        """
+        Args:
+            use_select: Multiplex with selectors (default: everywhere but Windows)
+        """
+        if use_select is None:
+            use_select = sys.platform != "win32"
+        self.use_select = use_select
+        self._lock = threading.Lock()
+        self._tunnels = {}
+        self._pending = []
+        self._selector = None
+        self._thread = None
+        self._wake_r = None
+        self._wake_w = None
+
+    def register(self, key, pipes, handler):
+        """
+        Start reading a tunnel's pipes.
+
+        Args:
+            key: Hashable tunnel identity (e.g. the Popen object)
+            pipes: File objects or file descriptors to read
+            handler: Callback handler(kind, value) for parsed events
+        """
+        fds = [_fileno(pipe) for pipe in pipes if pipe is not None]
+        with self._lock:
+            self._tunnels[key] = {
+                'handler': handler,
+                'parsers': {fd: TunnelLogParser() for fd in fds},
+                'url': None,
+            }
+            if self.use_select:
+                self._pending.extend((key, fd) for fd in fds)
+        if not self.use_select:
+            for fd in fds:
+                threading.Thread(target=self._read_blocking, args=(key, fd), daemon=True).start()
+            return
+        self._ensure_thread()
+        self._wake()
+
+    def unregister(self, key):
+        """Stop dispatching a tunnel's events (its pipes are still drained until EOF)."""
+        with self._lock:
+            self._tunnels.pop(key, None)
+
+    def _dispatch(self, key, fd, data):
+        with self._lock:
+            tunnel = self._tunnels.get(key)
+            if tunnel is None or fd not in tunnel['parsers']:
+                return
+            parser = tunnel['parsers'][fd]
+            if data:
+                events = parser.feed(data)
+            else:
+                events = parser.close()
+                del tunnel['parsers'][fd]
+                if not tunnel['parsers']:
+                    del self._tunnels[key]
+                    events.append(('closed', None))
+            dispatched = []
+            for kind, value in events:
+                if kind == 'url':
+                    if tunnel['url'] is not None:
+                        continue
+                    tunnel['url'] = value
+                dispatched.append((kind, value))
+            handler = tunnel['handler']
+        for kind, value in dispatched:
+            try:
+                handler(kind, value)
+            except Exception:
+                pass
+
+    def _read_blocking(self, key, fd):
+        while True:
+            try:
+                data = os.read(fd, READ_SIZE)
+            except OSError:
+                data = b''
+            self._dispatch(key, fd, data)
+            if not data:
+                return
+
+    def _ensure_thread(self):
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            if self._selector is None:
+                self._selector = selectors.DefaultSelector()
+                self._wake_r, self._wake_w = os.pipe()
+                os.set_blocking(self._wake_r, False)
+                self._selector.register(self._wake_r, selectors.EVENT_READ)
+            self._thread = threading.Thread(target=self._run, daemon=True)
+            self._thread.start()
+
+    def _wake(self):
+        try:
+            os.write(self._wake_w, b'\0')
+        except (BlockingIOError, OSError):
+            pass
+
+    def _run(self):
+        # Only this thread touches the selector; register() queues changes
+        while True:
+            with self._lock:
+                pending, self._pending = self._pending, []
+            for key, fd in pending:
+                try:
+                    if fd in self._selector.get_map():
+                        # A closed pipe's number was reused by a new one
+                        self._selector.unregister(fd)
+                    self._selector.register(fd, selectors.EVENT_READ, key)
+                except (ValueError, KeyError, OSError):
+                    self._dispatch(key, fd, b'')
+            for selector_key, _ in self._selector.select():
+                fd = selector_key.fd
+                if fd == self._wake_r:
+                    try:
+                        while os.read(fd, READ_SIZE):
+                            pass
+                    except BlockingIOError:
+                        pass
+                    continue
+                try:
+                    data = os.read(fd, READ_SIZE)
+                except OSError:
+                    data = b''
+                if not data:
+                    self._selector.unregister(fd)
+                self._dispatch(selector_key.data, fd, data)
+
+
+def get_output_loop():
+    """Process-wide OutputLoop."""
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = OutputLoop()
+    return _loop
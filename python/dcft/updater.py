@@ -0,0 +1,208 @@
+"""Background update checks and hot-swap of the cloudflared binary."""
+import os
+import hashlib
+import threading
+from urllib.parse import urljoin
+from . import bin_loader
+from . import store
+from .downloader import CHUNK_SIZE
+from .filelock import FileLock
+from .bin_loader import (
+    expire_manifest_cache,
+    fetch_artifact,
+    get_platform_key,
+    is_verified,
+    load_bin_config,
+    load_verified_manifest,
+    record_verified,
+)
+
+RELEASE_CACHE = ".release.json.cache"
+CHECK_INTERVAL = 6 * 3600
+
+
+def release_shard_url(platform_key, bin_json=None):
+    """URL of the per-platform release shard published next to bin.json."""
+    return urljoin(bin_json or bin_loader.BIN_JSON, f"releases/{platform_key}.json")
+
+
+def installed_sha256(binary_path):
+    """SHA256 of the installed binary, from the verified manifest when possible."""
+    bin_dir, filename = os.path.split(binary_path)
+    entry = load_verified_manifest(bin_dir).get(filename) or {}
+    if entry.get('sha256'):
+        return entry['sha256']
+    digest = hashlib.sha256()
+    try:
+        with open(binary_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+    except OSError:
+        return None
+    return digest.hexdigest()
+
+
+def check_for_update(binary_path, bin_json=None, platform_key=None, session=None):
+    """
+    Check whether a newer build of the installed binary is published.
+
+    Only this platform's release shard is fetched, revalidated with a
+    conditional GET (a 304 transfers no body).
+
+    Args:
+        binary_path: Path of the installed binary
+        bin_json: Manifest URL the shard is resolved against (default: BIN_JSON)
+        platform_key: Platform key (default: current platform)
+        session: requests.Session to use (default: the shared pooled session)
+
+    Returns:
+        dict: The newer file entry (with 'version' and 'build'), or None
+    """
+    platform_key = platform_key or get_platform_key()
+    if not platform_key or not binary_path:
+        return None
+
+    bin_dir, filename = os.path.split(binary_path)
+    shard = load_bin_config(cache_dir=bin_dir, ttl=0, url=release_shard_url(platform_key, bin_json),
+                            session=session, cache_name=RELEASE_CACHE)
+    entry = next((f for f in shard.get('files', []) if f.get('filename') == filename), None)
+    if not entry or not entry.get('sha256') or not entry.get('url'):
+        return None
+
+    if installed_sha256(binary_path) == entry['sha256'].lower():
+        return None
+    return dict(entry, version=shard.get('version'), build=shard.get('build'))
+
+
+class BackgroundUpdater:
+    """
+    Periodically checks for a newer build and stages it without touching
+    the running binary.
+
+    Usage:
+        updater = BackgroundUpdater(binary_path)
+        updater.start()
+        ...
+        # with the tunnel stopped:
+        updater.apply()
+    """
+
+    def __init__(self, binary_path, interval=CHECK_INTERVAL, bin_json=None, session=None,
+                 use_store=True, store_dir=None, on_staged=None):
+        """
+        Args:
+            binary_path: Path of the installed binary
+            interval: Seconds between checks (None = check once)
+            bin_json: Manifest URL the release shard is resolved against
+            session: requests.Session to use (default: the shared pooled session)
+            use_store: Stage new builds in the shared content-addressed store
+            store_dir: Shared store directory (default: ~/.cfbin/store)
+            on_staged: Callback(file_info) when a new build is ready to apply
+        """
+        self.binary_path = binary_path
+        self.interval = interval
+        self.bin_json = bin_json
+        self.session = session
+        self.use_store = use_store
+        self.store_dir = store_dir
+        self.on_staged = on_staged
+        self.staged = None
+        self._staged_path = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def check_now(self):
+        """
+        Check once and download a newer build if there is one.
+
+        Returns:
+            bool: True if a new build is staged
+        """
+        info = check_for_update(self.binary_path, self.bin_json, session=self.session)
+        if not info:
+            return False
+        with self._lock:
+            if self.staged and self.staged['sha256'] == info['sha256']:
+                return True
+
+        sha256 = info['sha256']
+        if self.use_store:
+            staged_path = store.blob_path(sha256, self.store_dir)
+            with FileLock(staged_path + '.lock'):
+                if not is_verified(staged_path, sha256):
+                    if not fetch_artifact(info, staged_path, session=self.session):
+                        return False
+                    record_verified(staged_path, sha256)
+        else:
+            staged_path = self.binary_path + '.next'
+            if not fetch_artifact(info, staged_path, repair=False, session=self.session):
+                return False
+
+        with self._lock:
+            self.staged = info
+            self._staged_path = staged_path
+        if self.on_staged:
+            self.on_staged(info)
+        return True
+
+    def _run(self, stop):
+        while not stop.is_set():
+            try:
+                self.check_now()
+            except Exception:
+                pass
+            if self.interval is None or stop.wait(self.interval):
+                break
+
+    def start(self):
+        """Start checking in a daemon thread."""
+        if self._thread and self._thread.is_alive() and not self._stop.is_set():
+            return
+        # A fresh event per run: a stopped thread still finishing a check
+        # exits on its own event without affecting the new one
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, args=(self._stop,), daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """Stop the background checks."""
+        self._stop.set()
+        self._thread = None
+
+    def apply(self):
+        """
+        Atomically swap the staged build into binary_path.
+
+        Call it while the tunnel is stopped (TunnelRunner.restart() does).
+        A binary that is still mapped by this process (a loaded DLL on
+        Windows) cannot be replaced; the build then stays staged.
+
+        Returns:
+            bool: True if the binary was replaced
+        """
+        with self._lock:
+            info, staged_path = self.staged, self._staged_path
+        if not info:
+            return False
+
+        sha256 = info['sha256']
+        bin_dir = os.path.dirname(self.binary_path)
+        try:
+            with FileLock(self.binary_path + '.lock'):
+                if self.use_store:
+                    if not store.link_into(sha256, self.binary_path, self.store_dir):
+                        return False
+                else:
+                    os.replace(staged_path, self.binary_path)
+                record_verified(self.binary_path, sha256)
+        except OSError:
+            return False
+
+        # Make the next get_bin() revalidate instead of trusting the old manifest
+        expire_manifest_cache(bin_dir)
+        with self._lock:
+            if self.staged is info:
+                self.staged = None
+                self._staged_path = None
+        return True
@@ -5,16 +5,233 @@ Enhanced Universal VPN/Tunnel Detector
 - Returns bool + confidence score (0.0 - 1.0)
 - Works with any VPN: WARP, OpenVPN, WireGuard, etc.
 """
-import subprocess
-import platform
 import socket
 import re
 import json
 import time
-from typing import Dict, List, Optional, Tuple
+import copy
+import errno
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from typing import Callable, Dict, List, Optional, Tuple
+if __package__:
+    from . import vpn_linux
+    from .vpn_snapshot import SystemSnapshot
+else:
+    # Run directly as a script: python dcft/vpn_detect.py
+    import os
+    import sys
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    from dcft import vpn_linux
+    from dcft.vpn_snapshot import SystemSnapshot
+
+# Overall wall-clock budget for detect_all(), in seconds
+DETECT_DEADLINE = 8.0
+# Per-probe budgets; probes not listed get DEFAULT_PROBE_TIMEOUT
+PROBE_TIMEOUTS = {
+    'gateway': 7.0,
+    'ip_mismatch': 5.0,
+    'traceroute': 6.0,
+    'latency': 7.0,
+}
+DEFAULT_PROBE_TIMEOUT = 6.0
+# Confidence at which a VPN is reported even without a strong indicator
+VPN_THRESHOLD = 0.30
+# Rough relative cost of each method. With the native Linux backend the
+# snapshot checks only read /proc and /sys
+METHOD_COSTS = {
+    'virtual_interface': 1.0,
+    'routing': 1.0,
+    'dns': 1.0,
+    'vpn_process': 2.0,
+    'mtu_check': 1.0,
+    'network_adapter': 1.0,
+    'gateway': 30.0,
+    'ip_mismatch': 40.0,
+    'traceroute': 30.0,
+    'latency': 30.0,
+}
+# Elsewhere every snapshot source is a command (ipconfig, tasklist, netstat, wmic)
+COMMAND_METHOD_COSTS = dict(METHOD_COSTS, **{
+    'virtual_interface': 10.0,
+    'routing': 10.0,
+    'dns': 10.0,
+    'vpn_process': 20.0,
+    'mtu_check': 10.0,
+    'network_adapter': 20.0,
+})
+SNAPSHOT_METHODS = ('virtual_interface', 'routing', 'dns', 'vpn_process', 'mtu_check', 'network_adapter')
+# How long is_vpn_connected()/get_vpn_details() reuse a verdict, in seconds
+VERDICT_TTL = 60.0
+_cache = {}
+_cache_generation = 0
+_cache_lock = threading.Lock()
+_detect_lock = threading.Lock()
+_watcher = None
+_listeners = []
+
+
+def _local_ip() -> str:
+    """Source address of the default route (no packet is sent)"""
+    s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    try:
+        s.connect(("8.8.8.8", 80))
+        return s.getsockname()[0]
+    finally:
+        s.close()
+
+
+# Pure checks over a SystemSnapshot; each one only reads snapshot sources
+VPN_INTERFACE_INDICATORS = [
+    'cloudflare warp', 'warp interface', 'tun', 'tap',
+    'utun', 'ppp', 'vpn', 'wireguard', 'wg', 'nord',
+    'express', 'proton', 'mullvad', 'pia', 'tunnelblick',
+    'openvpn', 'viscosity', 'pritunl'
+]
+# VPN-specific CGNAT ranges
+VPN_ROUTE_RANGES = ['100.96.', '100.64.', '10.8.', '10.2.', '172.16.']
+VPN_ROUTE_IFACES = ['tun', 'tap', 'utun', 'ppp', 'wg']
+VPN_DNS = [
+    ('1.1.1.1', 'Cloudflare WARP'),
+    ('1.0.0.1', 'Cloudflare WARP'),
+    ('103.86.96.', 'NordVPN'),
+    ('103.86.99.', 'NordVPN'),
+    ('10.8.0.', 'OpenVPN'),
+    ('162.252.172.', 'ProtonVPN'),
+]
+VPN_PROCESSES = ['openvpn', 'wireguard', 'wg-quick', 'nordvpnd', 'expressvpn', 'protonvpn']
+VPN_PROCESSES_WINDOWS = ['openvpn.exe', 'wireguard.exe', 'nordvpn.exe', 'expressvpn', 'protonvpn']
+VPN_ADAPTER_KEYWORDS = [
+    'cloudflare', 'warp', 'tunnel', 'vpn',
+    'openvpn', 'wireguard', 'tap', 'tun',
+    'nord', 'express', 'proton', 'mullvad'
+]
+
+
+def detect_virtual_interfaces(snapshot: SystemSnapshot) -> Tuple[bool, List[str]]:
+    """Virtual network interfaces; returns (detected, matching interfaces)"""
+    interfaces = []
+    if snapshot.native:
+        for iface in snapshot.get('links') or []:
+            if not vpn_linux.is_up(iface):
+                continue
+            name = iface['name'].lower()
+            if vpn_linux.is_virtual(iface) or any(name.startswith(i) for i in VPN_INTERFACE_INDICATORS):
+                interfaces.append(iface['name'])
+        return bool(interfaces), interfaces
+    output = snapshot.get('addrs') or ''
+    output_lower = output.lower()
+    for indicator in VPN_INTERFACE_INDICATORS:
+        if indicator in output_lower:
+            for line in output.split('\n'):
+                if indicator in line.lower():
+                    interfaces.append(line.strip())
+            return True, interfaces
+    return False, interfaces
+
+
+def detect_vpn_routes(snapshot: SystemSnapshot) -> bool:
+    """VPN ranges or tunnel interfaces in the routing table"""
+    routes = snapshot.get('routes')
+    if snapshot.native:
+        output = '\n'.join(f"{r['destination']} via {r['gateway']} dev {r['iface']}" for r in routes or [])
+    else:
+        output = (routes or '').lower()
+    vpn_count = sum(1 for r in VPN_ROUTE_RANGES if r in output)
+    # Check interface names in routes
+    iface_count = sum(1 for i in VPN_ROUTE_IFACES if i in output)
+    return vpn_count >= 1 or iface_count >= 1
+
+
+def detect_vpn_dns(snapshot: SystemSnapshot) -> Tuple[bool, List[str]]:
+    """Resolvers of known VPN providers; returns (detected, matching servers)"""
+    if snapshot.system == "Windows":
+        dns_section = False
+        for line in (snapshot.get('addrs') or '').split('\n'):
+            if 'DNS Servers' in line:
+                dns_section = True
+            if dns_section:
+                for dns, provider in VPN_DNS:
+                    if dns in line:
+                        return True, [f"{dns} ({provider})"]
+                if 'adapter' in line.lower():
+                    dns_section = False
+    elif snapshot.native:
+        for server in snapshot.get('resolv') or []:
+            for dns, provider in VPN_DNS:
+                if server.startswith(dns):
+                    return True, [f"{dns} ({provider})"]
+    else:
+        content = snapshot.get('resolv') or ''
+        for dns, provider in VPN_DNS:
+            if dns in content:
+                return True, [f"{dns} ({provider})"]
+    return False, []
+
+
+def detect_vpn_processes(snapshot: SystemSnapshot) -> bool:
+    """Running VPN clients (and WARP traffic on Windows)"""
+    if snapshot.system == "Windows":
+        connections = snapshot.get('connections') or ''
+        # WARP active = UDP 2408 or connections to Cloudflare edge
+        warp_active = (
+            ':2408' in connections or
+            '162.159.' in connections or
+            ':500' in connections and 'UDP' in connections
+        )
+        if warp_active:
+            return True
+        output_lower = (snapshot.get('processes') or '').lower()
+        return any(vpn in output_lower for vpn in VPN_PROCESSES_WINDOWS)
+    if snapshot.native:
+        names = [n.lower() for n in snapshot.get('processes') or []]
+        return any(vpn in name for name in names for vpn in VPN_PROCESSES)
+    output_lower = (snapshot.get('processes') or '').lower()
+    return any(vpn in output_lower for vpn in VPN_PROCESSES)
+
+
+def detect_low_mtu(snapshot: SystemSnapshot) -> bool:
+    """Tunnel interfaces with an MTU below 1400"""
+    links = snapshot.get('links')
+    if snapshot.native:
+        for iface in links or []:
+            if not vpn_linux.is_up(iface):
+                continue
+            tunnel_like = vpn_linux.is_virtual(iface) or iface['name'].startswith(('tun', 'tap', 'utun'))
+            if tunnel_like and iface['mtu'] and iface['mtu'] < 1400:
+                return True
+    elif snapshot.system == "Windows":
+        for line in (links or '').split('\n'):
+            if any(vpn in line.lower() for vpn in ['warp', 'tun', 'tap', 'vpn']):
+                match = re.search(r'\s+(\d+)\s+', line)
+                if match and int(match.group(1)) < 1400:
+                    return True
+    else:
+        current_iface = None
+        for line in (links or '').split('\n'):
+            if 'tun' in line or 'tap' in line or 'utun' in line:
+                current_iface = line
+            if current_iface and 'mtu' in line.lower():
+                match = re.search(r'mtu\s+(\d+)', line.lower())
+                if match and int(match.group(1)) < 1400:
+                    return True
+    return False
+
+
+def detect_vpn_adapters(snapshot: SystemSnapshot) -> bool:
+    """VPN keywords in enabled adapter descriptions (Windows only)"""
+    output_lower = (snapshot.get('adapters') or '').lower()
+    return any(keyword in output_lower and 'true' in output_lower for keyword in VPN_ADAPTER_KEYWORDS)
+
+
 class VPNDetector:
-    def __init__(self):
-        self.system = platform.system()
+    def __init__(self, deadline: float = DETECT_DEADLINE, probe_timeouts: Optional[Dict[str, float]] = None,
+                 native: Optional[bool] = None, snapshot: Optional[SystemSnapshot] = None):
+        # One snapshot per detector: every check reads the same routes, links and processes
+        self.snapshot = snapshot or SystemSnapshot(native=native)
+        self.system = self.snapshot.system
+        # On Linux, read /proc and /sys directly instead of forking ip/ps/ping
+        self.native = self.snapshot.native
         self.results = {
             'vpn_detected': False,
             'confidence': 0.0,
@@ -26,6 +243,12 @@ class VPNDetector:
             'virtual_interfaces': [],
             'traceroute_hops': 0,
         }
+        self.deadline = deadline
+        self.probe_timeouts = dict(PROBE_TIMEOUTS, **(probe_timeouts or {}))
+        # Probes that missed the deadline may still finish; once a run is
+        # returned their writes are dropped instead of altering its results
+        self._results_lock = threading.Lock()
+        self._closed = False
         # Weights for each detection method (higher = more reliable)
         self.weights = {
             'gateway': 0.08,
@@ -39,10 +262,20 @@ class VPNDetector:
             'latency': 0.03,
             'network_adapter': 0.03,
         }
-    def detect_all(self) -> Dict:
-        """Run all detection methods with confidence scoring"""
-        total_confidence = 0.0
-        # Run all detection methods
+    def detect_all(self, fast: bool = False, reuse: Optional[Dict[str, Optional[bool]]] = None) -> Dict:
+        """
+        Run all detection methods concurrently with confidence scoring.
+        Each probe has its own timeout and all of them share one overall
+        deadline; probes that miss it are recorded as None (unknown) and
+        contribute nothing to the confidence.
+
+        Args:
+            fast: Only settle vpn_detected. Methods run cheapest-per-weight
+                first and evaluation stops as soon as the verdict can no
+                longer change; methods that never ran are recorded as None
+            reuse: Known method outcomes (e.g. from an earlier run) to score
+                without running those methods again
+        """
         methods = [
             ('gateway', self.check_gateway_reachable),
             ('virtual_interface', self.check_virtual_interfaces),
@@ -55,50 +288,163 @@ class VPNDetector:
             ('latency', self.check_gateway_latency),
             ('network_adapter', self.check_network_adapter_description),
         ]
-        for method_name, method_func in methods:
-            try:
-                detected = method_func()
-                self.results['methods'][method_name] = detected
-                if detected:
-                    total_confidence += self.weights.get(method_name, 0.05)
-            except Exception as e:
-                self.results['methods'][method_name] = False
-                # Silently handle errors in module mode
-        # Calculate final confidence (0.0 - 1.0)
-        self.results['confidence'] = min(total_confidence, 1.0)
-        # Determine if VPN is active
-        has_strong_indicators = (
-            self.results['methods'].get('virtual_interface', False) or
-            self.results['methods'].get('ip_mismatch', False) or
-            (
-                self.results['methods'].get('routing', False) and
-                self.results['methods'].get('vpn_process', False)
+        reuse = reuse or {}
+        with self._results_lock:
+            self._closed = False
+        run = [(name, func) for name, func in methods if name not in reuse]
+        if fast:
+            outcomes = self._run_fast(run, reuse)
+        else:
+            outcomes = dict(reuse, **self._run_probes(run))
+        outcomes = {name: outcomes.get(name) for name, _ in methods}
+        with self._results_lock:
+            self._closed = True
+            self.results['methods'] = dict(outcomes)
+            # Calculate final confidence (0.0 - 1.0)
+            self.results['confidence'] = min(self._confidence(outcomes), 1.0)
+            # Determine if VPN is active
+            self.results['vpn_detected'] = (
+                self.results['confidence'] >= VPN_THRESHOLD or self._has_strong_indicators(outcomes)
             )
+            return copy.deepcopy(self.results)
+    def _record(self, key: str, value, extend: bool = False):
+        """Store a probe detail in the results unless the run was already returned"""
+        with self._results_lock:
+            if self._closed:
+                return
+            if extend:
+                self.results[key].extend(value)
+            else:
+                self.results[key] = value
+    def _confidence(self, outcomes: Dict[str, Optional[bool]]) -> float:
+        return sum(self.weights.get(name, 0.05) for name, detected in outcomes.items() if detected)
+    @staticmethod
+    def _has_strong_indicators(outcomes: Dict[str, Optional[bool]]) -> bool:
+        return bool(
+            outcomes.get('virtual_interface') or
+            outcomes.get('ip_mismatch') or
+            (outcomes.get('routing') and outcomes.get('vpn_process'))
         )
-        self.results['vpn_detected'] = (
-            self.results['confidence'] >= 0.30 or has_strong_indicators
+    def _settled(self, outcomes: Dict[str, Optional[bool]], pending: List[str]) -> bool:
+        """True once the remaining methods can no longer change vpn_detected"""
+        if self._confidence(outcomes) >= VPN_THRESHOLD or self._has_strong_indicators(outcomes):
+            return True
+        # Best case: every pending method comes back positive
+        best = dict(outcomes, **{name: True for name in pending})
+        return self._confidence(best) < VPN_THRESHOLD and not self._has_strong_indicators(best)
+    def _run_fast(self, methods: List[Tuple[str, Callable[[], bool]]],
+                  known: Optional[Dict[str, Optional[bool]]] = None) -> Dict[str, Optional[bool]]:
+        """
+        Cost-ordered evaluation that stops once the verdict is settled.
+
+        Snapshot checks form a cheap tier that runs before any network
+        probe starts. With the native backend they are nearly free and run
+        one by one; other backends spawn a command per source, so that tier
+        runs concurrently. The network probes (ping, traceroute, public IP
+        lookup) only start if the verdict is still open afterwards.
+        """
+        costs = METHOD_COSTS if self.snapshot.native else COMMAND_METHOD_COSTS
+        ordered = sorted(methods, key=lambda m: costs.get(m[0], 1.0) / self.weights.get(m[0], 0.05))
+        outcomes = dict(known or {}, **{name: None for name, _ in methods})
+        pending = [name for name, _ in ordered]
+        deadline = time.monotonic() + self.deadline
+        if self.snapshot.native:
+            for name, func in ordered:
+                if name not in SNAPSHOT_METHODS:
+                    continue
+                if self._settled(outcomes, pending):
+                    return outcomes
+                pending.remove(name)
+                try:
+                    outcomes[name] = bool(func())
+                except Exception:
+                    outcomes[name] = False
+        tiers = (
+            [(name, func) for name, func in ordered if name in SNAPSHOT_METHODS],
+            [(name, func) for name, func in ordered if name not in SNAPSHOT_METHODS],
         )
-        return self.results
+        for tier in tiers:
+            tier = [(name, func) for name, func in tier if name in pending]
+            if not tier:
+                continue
+            if self._settled(outcomes, pending):
+                return outcomes
+            # Each tier runs concurrently until the verdict is settled
+            outcomes.update(self._run_probes(
+                tier,
+                lambda done: self._settled(dict(outcomes, **done), [n for n in pending if n not in done]),
+                deadline
+            ))
+            for name, _ in tier:
+                pending.remove(name)
+        return outcomes
+    def _run_probes(self, methods: List[Tuple[str, Callable[[], bool]]],
+                    settled: Optional[Callable[[Dict[str, bool]], bool]] = None,
+                    deadline: Optional[float] = None) -> Dict[str, Optional[bool]]:
+        """
+        Run probes in a thread pool; None marks a probe that timed out.
+
+        settled(finished) is called with the results so far after each
+        probe completes; once it returns True the rest are abandoned.
+        deadline is an absolute time.monotonic() shared with earlier tiers
+        (default: self.deadline from now).
+        """
+        start = time.monotonic()
+        overall = start + self.deadline if deadline is None else deadline
+        results = {name: None for name, _ in methods}
+        finished = {}
+        if not methods:
+            return results
+        pool = ThreadPoolExecutor(max_workers=len(methods))
+        try:
+            pending = {}
+            for name, func in methods:
+                limit = self.probe_timeouts.get(name, DEFAULT_PROBE_TIMEOUT)
+                pending[pool.submit(func)] = (name, min(start + limit, overall))
+            while pending:
+                now = time.monotonic()
+                for future in [f for f, (_, due) in pending.items() if due <= now and not f.done()]:
+                    del pending[future]
+                if not pending:
+                    break
+                next_due = min(due for _, due in pending.values())
+                done, _ = wait(list(pending), timeout=max(0.0, next_due - now), return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, _ = pending.pop(future)
+                    try:
+                        results[name] = bool(future.result())
+                    except Exception:
+                        # Silently handle errors in module mode
+                        results[name] = False
+                    finished[name] = results[name]
+                if settled and done and settled(finished):
+                    break
+        finally:
+            # Late probes finish on their own (their subprocesses have timeouts)
+            pool.shutdown(wait=False, cancel_futures=True)
+        return results
     def check_gateway_reachable(self) -> bool:
         """Check if default gateway is reachable"""
         try:
             gateway = self.get_default_gateway()
             if not gateway:
                 return False
-            self.results['gateway'] = gateway
+            self._record('gateway', gateway)
             # Ping gateway multiple times for reliability
             success_count = 0
-            for _ in range(3):
+            if self.native:
+                success_count = sum(
+                    1 for i in range(3)
+                    if self.snapshot.probe(f'gateway.{i}', lambda: vpn_linux.probe_host(gateway)) is not None
+                )
+                return success_count < 2
+            for i in range(3):
                 if self.system == "Windows":
                     cmd = ['ping', '-n', '1', '-w', '500', gateway]
                 else:
                     cmd = ['ping', '-c', '1', '-W', '1', gateway]
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    timeout=2
-                )
-                if result.returncode == 0:
+                result = self.snapshot.run(f'gateway.{i}', cmd, timeout=2)
+                if result['returncode'] == 0:
                     success_count += 1
             # If gateway mostly unreachable, likely VPN
             return success_count < 2
@@ -106,186 +452,35 @@ class VPNDetector:
             return False
     def get_default_gateway(self) -> Optional[str]:
         """Get default gateway IP"""
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['ipconfig'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                for line in result.stdout.split('\n'):
-                    if 'Default Gateway' in line or 'デフォルト ゲートウェイ' in line:
-                        match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
-                        if match:
-                            return match.group(1)
-            elif self.system == "Linux":
-                result = subprocess.run(
-                    ['ip', 'route', 'show', 'default'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                match = re.search(r'default via (\d+\.\d+\.\d+\.\d+)', result.stdout)
-                if match:
-                    return match.group(1)
-            elif self.system == "Darwin":
-                result = subprocess.run(
-                    ['route', '-n', 'get', 'default'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                for line in result.stdout.split('\n'):
-                    if 'gateway:' in line:
-                        match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
-                        if match:
-                            return match.group(1)
-        except:
-            pass
-        return None
+        return self.snapshot.default_gateway()
     def check_virtual_interfaces(self) -> bool:
         """Check for virtual network interfaces"""
-        vpn_indicators = [
-            'cloudflare warp', 'warp interface', 'tun', 'tap',
-            'utun', 'ppp', 'vpn', 'wireguard', 'wg', 'nord',
-            'express', 'proton', 'mullvad', 'pia', 'tunnelblick',
-            'openvpn', 'viscosity', 'pritunl'
-        ]
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['ipconfig', '/all'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            elif self.system == "Linux":
-                result = subprocess.run(
-                    ['ip', 'addr'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            else:
-                result = subprocess.run(
-                    ['ifconfig'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            output_lower = result.stdout.lower()
-            for indicator in vpn_indicators:
-                if indicator in output_lower:
-                    for line in result.stdout.split('\n'):
-                        if indicator in line.lower():
-                            self.results['virtual_interfaces'].append(line.strip())
-                    return True
-        except:
-            pass
-        return False
+        detected, interfaces = detect_virtual_interfaces(self.snapshot)
+        self._record('virtual_interfaces', interfaces, extend=True)
+        return detected
     def check_routing_table(self) -> bool:
         """Check routing table for VPN patterns"""
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['route', 'print', '0.0.0.0'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            elif self.system == "Linux":
-                result = subprocess.run(
-                    ['ip', 'route'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            else:
-                result = subprocess.run(
-                    ['netstat', '-rn'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-            output = result.stdout.lower()
-            # VPN-specific CGNAT ranges
-            vpn_ranges = [
-                '100.96.',
-                '100.64.',
-                '10.8.',
-                '10.2.',
-                '172.16.',
-            ]
-            vpn_count = sum(1 for r in vpn_ranges if r in output)
-            # Check interface names in routes
-            vpn_ifaces = ['tun', 'tap', 'utun', 'ppp', 'wg']
-            iface_count = sum(1 for i in vpn_ifaces if i in output)
-            return vpn_count >= 1 or iface_count >= 1
-        except:
-            pass
-        return False
+        return detect_vpn_routes(self.snapshot)
     def check_dns_servers(self) -> bool:
         """Check DNS servers for VPN providers"""
-        vpn_dns = [
-            ('1.1.1.1', 'Cloudflare WARP'),
-            ('1.0.0.1', 'Cloudflare WARP'),
-            ('103.86.96.', 'NordVPN'),
-            ('103.86.99.', 'NordVPN'),
-            ('10.8.0.', 'OpenVPN'),
-            ('162.252.172.', 'ProtonVPN'),
-        ]
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['ipconfig', '/all'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                dns_section = False
-                for line in result.stdout.split('\n'):
-                    if 'DNS Servers' in line:
-                        dns_section = True
-                    if dns_section:
-                        for dns, provider in vpn_dns:
-                            if dns in line:
-                                self.results['dns_servers'].append(f"{dns} ({provider})")
-                                return True
-                        if 'adapter' in line.lower():
-                            dns_section = False
-            else:
-                try:
-                    with open('/etc/resolv.conf', 'r') as f:
-                        content = f.read()
-                        for dns, provider in vpn_dns:
-                            if dns in content:
-                                self.results['dns_servers'].append(f"{dns} ({provider})")
-                                return True
-                except:
-                    pass
-        except:
-            pass
-        return False
+        detected, servers = detect_vpn_dns(self.snapshot)
+        self._record('dns_servers', servers, extend=True)
+        return detected
     def check_ip_mismatch(self) -> bool:
         """Advanced IP analysis - check for CGNAT ranges"""
         try:
             # Get local IP
-            s = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-            s.connect(("8.8.8.8", 80))
-            local_ip = s.getsockname()[0]
-            s.close()
-            self.results['local_ip'] = local_ip
+            local_ip = self.snapshot.probe('local_ip', _local_ip)
+            self._record('local_ip', local_ip)
             # Get public IP
             try:
-                result = subprocess.run(
+                result = self.snapshot.run(
+                    'public_ip',
                     ['curl', '-s', '--max-time', '3', 'https://api.ipify.org'],
-                    capture_output=True,
-                    text=True,
                     timeout=4
                 )
-                public_ip = result.stdout.strip()
-                self.results['public_ip'] = public_ip
+                public_ip = result['stdout'].strip()
+                self._record('public_ip', public_ip)
                 # CGNAT/VPN ranges (STRONG indicator)
                 cgnat_ranges = [
                     '100.64.',
@@ -307,115 +502,28 @@ class VPNDetector:
         return False
     def check_vpn_processes(self) -> bool:
         """Check for ACTIVE VPN processes"""
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['netstat', '-ano'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                # WARP active = UDP 2408 or connections to Cloudflare edge
-                warp_active = (
-                    ':2408' in result.stdout or
-                    '162.159.' in result.stdout or
-                    ':500' in result.stdout and 'UDP' in result.stdout
-                )
-                if warp_active:
-                    return True
-                # Check for other VPN processes
-                vpn_indicators = [
-                    'openvpn.exe',
-                    'wireguard.exe',
-                    'nordvpn.exe',
-                    'expressvpn',
-                    'protonvpn'
-                ]
-                result = subprocess.run(
-                    ['tasklist', '/FO', 'CSV', '/NH'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                output_lower = result.stdout.lower()
-                for vpn in vpn_indicators:
-                    if vpn in output_lower:
-                        return True
-            else:
-                result = subprocess.run(
-                    ['ps', 'aux'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                output_lower = result.stdout.lower()
-                active_vpns = [
-                    'openvpn',
-                    'wireguard',
-                    'wg-quick',
-                    'nordvpnd',
-                    'expressvpn',
-                    'protonvpn'
-                ]
-                return any(vpn in output_lower for vpn in active_vpns)
-        except:
-            pass
-        return False
+        return detect_vpn_processes(self.snapshot)
     def check_mtu_size(self) -> bool:
         """Check MTU size (VPNs often use smaller MTU)"""
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['netsh', 'interface', 'ipv4', 'show', 'subinterfaces'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                for line in result.stdout.split('\n'):
-                    if any(vpn in line.lower() for vpn in ['warp', 'tun', 'tap', 'vpn']):
-                        match = re.search(r'\s+(\d+)\s+', line)
-                        if match:
-                            mtu = int(match.group(1))
-                            if mtu < 1400:
-                                return True
-            else:
-                result = subprocess.run(
-                    ['ip', 'link'] if self.system == 'Linux' else ['ifconfig'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                current_iface = None
-                for line in result.stdout.split('\n'):
-                    if 'tun' in line or 'tap' in line or 'utun' in line:
-                        current_iface = line
-                    if current_iface and 'mtu' in line.lower():
-                        match = re.search(r'mtu\s+(\d+)', line.lower())
-                        if match:
-                            mtu = int(match.group(1))
-                            if mtu < 1400:
-                                return True
-        except:
-            pass
-        return False
+        return detect_low_mtu(self.snapshot)
     def check_traceroute_pattern(self) -> bool:
         """Check if first hop is unusual"""
         try:
             gateway = self.results.get('gateway') or self.get_default_gateway()
             if not gateway:
                 return False
+            if self.native:
+                # One probe per hop, so every silent hop counts as a full row of '*'
+                hops = self.snapshot.probe('traceroute', lambda: vpn_linux.trace_first_hops(gateway, max_hops=3)) * 3
+                self._record('traceroute_hops', hops)
+                return hops > 2
             if self.system == "Windows":
                 cmd = ['tracert', '-h', '3', '-w', '500', gateway]
             else:
                 cmd = ['traceroute', '-m', '3', '-w', '1', gateway]
-            result = subprocess.run(
-                cmd,
-                capture_output=True,
-                text=True,
-                timeout=5
-            )
-            hops = result.stdout.count('ms') if self.system == "Windows" else result.stdout.count('*')
-            self.results['traceroute_hops'] = hops
+            output = self.snapshot.run('traceroute', cmd, timeout=5)['stdout']
+            hops = output.count('ms') if self.system == "Windows" else output.count('*')
+            self._record('traceroute_hops', hops)
             return hops > 2
         except:
             pass
@@ -427,19 +535,17 @@ class VPNDetector:
             if not gateway:
                 return False
             latencies = []
-            for _ in range(3):
+            if self.native:
+                samples = [self.snapshot.probe(f'latency.{i}', lambda: vpn_linux.probe_host(gateway)) for i in range(3)]
+                latencies = [ms for ms in samples if ms is not None]
+            for i in range(0 if self.native else 3):
                 if self.system == "Windows":
                     cmd = ['ping', '-n', '1', '-w', '1000', gateway]
                 else:
                     cmd = ['ping', '-c', '1', '-W', '1', gateway]
-                result = subprocess.run(
-                    cmd,
-                    capture_output=True,
-                    text=True,
-                    timeout=2
-                )
-                if result.returncode == 0:
-                    match = re.search(r'time[=<](\d+)', result.stdout)
+                result = self.snapshot.run(f'latency.{i}', cmd, timeout=2)
+                if result['returncode'] == 0:
+                    match = re.search(r'time[=<](\d+)', result['stdout'])
                     if match:
                         latencies.append(int(match.group(1)))
             if latencies:
@@ -450,27 +556,7 @@ class VPNDetector:
         return False
     def check_network_adapter_description(self) -> bool:
         """Check network adapter descriptions for VPN keywords"""
-        try:
-            if self.system == "Windows":
-                result = subprocess.run(
-                    ['wmic', 'nic', 'get', 'name,netenabled'],
-                    capture_output=True,
-                    text=True,
-                    timeout=5
-                )
-                vpn_keywords = [
-                    'cloudflare', 'warp', 'tunnel', 'vpn',
-                    'openvpn', 'wireguard', 'tap', 'tun',
-                    'nord', 'express', 'proton', 'mullvad'
-                ]
-                output_lower = result.stdout.lower()
-                for keyword in vpn_keywords:
-                    if keyword in output_lower and 'true' in output_lower:
-                        return True
-        except:
-            pass
-        return False
-
+        return detect_vpn_adapters(self.snapshot)
 
 if __name__ == "__main__":
 
@@ -483,14 +569,117 @@ if __name__ == "__main__":
     print(f"CONFIDENCE={results['confidence']:.3f}")
 
 # Simple wrapper functions for easy import
-def is_vpn_connected():
-    """Check if VPN is connected. Returns True if VPN detected."""
-    detector = VPNDetector()
-    results = detector.detect_all()
-    return results["vpn_detected"]
+def invalidate_vpn_cache():
+    """Drop the cached verdict so the next check runs a fresh detection."""
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        _cache.clear()
 
 
-def get_vpn_details():
-    """Get detailed VPN detection results."""
-    detector = VPNDetector()
-    return detector.detect_all()
+def add_network_listener(callback: Callable[[], None]) -> bool:
+    """
+    Call callback() from the netlink listener whenever links, addresses or
+    routes change.
+
+    Returns:
+        bool: False if change notifications are not available on this system
+    """
+    with _cache_lock:
+        _start_watcher()
+        if not _watcher:
+            return False
+        _listeners.append(callback)
+    return True
+
+
+def remove_network_listener(callback: Callable[[], None]):
+    """Stop notifying a callback registered with add_network_listener()"""
+    with _cache_lock:
+        if callback in _listeners:
+            _listeners.remove(callback)
+
+
+def _watch_network(sock):
+    while True:
+        try:
+            sock.recv(65536)
+        except OSError as e:
+            if e.errno != errno.ENOBUFS:
+                break
+        # Any link/address/route change may bring a VPN up or down
+        invalidate_vpn_cache()
+        with _cache_lock:
+            listeners = list(_listeners)
+        for callback in listeners:
+            try:
+                callback()
+            except Exception:
+                pass
+
+
+def _start_watcher():
+    global _watcher
+    if _watcher is not None:
+        return
+    sock = vpn_linux.open_route_monitor() if vpn_linux.available() else None
+    _watcher = False
+    if sock is not None:
+        _watcher = threading.Thread(target=_watch_network, args=(sock,), daemon=True)
+        _watcher.start()
+
+
+def _cached(modes: Tuple[str, ...], max_age: float) -> Tuple[Optional[Dict], int]:
+    """Fresh cached results for any of modes (or None), plus the cache generation"""
+    with _cache_lock:
+        now = time.monotonic()
+        for mode in modes:
+            cached = _cache.get(mode)
+            if cached and now - cached[0] < max_age:
+                return copy.deepcopy(cached[1]), _cache_generation
+        return None, _cache_generation
+
+
+def _detect(fast: bool, max_age: Optional[float]) -> Dict:
+    """Cached detection; a full run also answers fast lookups, not the reverse"""
+    max_age = VERDICT_TTL if max_age is None else max_age
+    modes = ('full', 'fast') if fast else ('full',)
+    with _cache_lock:
+        _start_watcher()
+    # A cache hit never waits behind another thread's detection
+    results, _ = _cached(modes, max_age)
+    if results is not None:
+        return results
+    with _detect_lock:
+        # Another thread may have filled the cache while we waited
+        results, generation = _cached(modes, max_age)
+        if results is not None:
+            return results
+        results = VPNDetector().detect_all(fast=fast)
+        with _cache_lock:
+            # A change during detection makes this run stale; don't cache it
+            if generation == _cache_generation:
+                _cache[modes[-1]] = (time.monotonic(), copy.deepcopy(results))
+    return results
+
+
+def get_vpn_details(max_age: Optional[float] = None):
+    """
+    Get detailed VPN detection results.
+
+    The verdict is cached process-wide for max_age seconds; on Linux a
+    netlink listener drops it as soon as interfaces or routes change.
+
+    Args:
+        max_age: Oldest cached verdict to accept, in seconds (default: VERDICT_TTL, 0 = always detect)
+    """
+    return _detect(False, max_age)
+
+
+def is_vpn_connected(max_age: Optional[float] = None):
+    """
+    Check if VPN is connected. Returns True if VPN detected.
+
+    Uses the fast verdict: detection stops as soon as the answer is settled.
+    """
+    return _detect(True, max_age)["vpn_detected"]
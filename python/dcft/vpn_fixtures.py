@@ -0,0 +1,199 @@
+"""Record, replay and benchmark VPN detection runs.
+
+Usage:
+    python -m dcft.vpn_fixtures record fixtures/vpn/myhost.json
+    python -m dcft.vpn_fixtures replay
+    python -m dcft.vpn_fixtures bench --runs 500
+    python -m dcft.vpn_fixtures bench --live
+
+A fixture is a saved SystemSnapshot (raw command outputs, /proc and /sys
+reads, probe results) plus the verdict the recording host reached.
+Replays never run a command or touch the network, so Windows and macOS
+fixtures run on a plain Linux box.
+"""
+import os
+import sys
+import json
+import time
+import argparse
+import statistics
+from . import vpn_linux
+from .vpn_detect import VPNDetector
+from .vpn_snapshot import SystemSnapshot
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fixtures', 'vpn')
+RUNS = 200
+LIVE_RUNS = 5
+
+CHECKS = {
+    'gateway': 'check_gateway_reachable',
+    'virtual_interface': 'check_virtual_interfaces',
+    'routing': 'check_routing_table',
+    'dns': 'check_dns_servers',
+    'ip_mismatch': 'check_ip_mismatch',
+    'vpn_process': 'check_vpn_processes',
+    'mtu_check': 'check_mtu_size',
+    'traceroute': 'check_traceroute_pattern',
+    'latency': 'check_gateway_latency',
+    'network_adapter': 'check_network_adapter_description',
+}
+
+
+def record(path, native=None, description=None):
+    """
+    Run a live detection and save everything it read as a fixture.
+
+    Args:
+        path: Fixture file to write
+        native: Use the /proc and /sys backend (default: auto)
+        description: Free-form note stored in the fixture
+
+    Returns:
+        dict: The detection results
+    """
+    detector = VPNDetector(native=native)
+    results = detector.detect_all()
+    data = detector.snapshot.collect_all().to_dict()
+    data['description'] = description
+    data['expected'] = {'vpn_detected': results['vpn_detected'], 'methods': results['methods']}
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+    return results
+
+
+def load_fixtures(path=None):
+    """Load one fixture file, or every *.json in a directory, as [(name, data)]."""
+    path = path or FIXTURE_DIR
+    if os.path.isdir(path):
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path)) if name.endswith('.json')]
+    else:
+        files = [path]
+    fixtures = []
+    for file_path in files:
+        with open(file_path, 'r', encoding='utf-8') as f:
+            fixtures.append((os.path.splitext(os.path.basename(file_path))[0], json.load(f)))
+    return fixtures
+
+
+def replay(data, fast=False):
+    """Run detect_all() against a fixture."""
+    return VPNDetector(snapshot=SystemSnapshot.from_dict(data)).detect_all(fast=fast)
+
+
+def compare(data, results):
+    """
+    Differences between a replay and the fixture's recorded verdict.
+
+    Methods recorded as None (timed out while recording) are not compared.
+
+    Returns:
+        list: Human-readable mismatches (empty if the replay agrees)
+    """
+    expected = data.get('expected') or {}
+    mismatches = []
+    if 'vpn_detected' in expected and expected['vpn_detected'] != results['vpn_detected']:
+        mismatches.append(f"vpn_detected: expected {expected['vpn_detected']}, got {results['vpn_detected']}")
+    for name, value in (expected.get('methods') or {}).items():
+        if value is not None and results['methods'].get(name) != value:
+            mismatches.append(f"{name}: expected {value}, got {results['methods'].get(name)}")
+    return mismatches
+
+
+def bench_methods(data, runs=RUNS):
+    """
+    Mean time of each check against a fixture, in seconds.
+
+    Every run gets a fresh detector over the same recorded sources, so the
+    time is the check's own parsing and scoring, not command execution.
+    """
+    timings = {}
+    for name, method in CHECKS.items():
+        total = 0.0
+        for _ in range(runs):
+            detector = VPNDetector(snapshot=SystemSnapshot.from_dict(data))
+            start = time.perf_counter()
+            getattr(detector, method)()
+            total += time.perf_counter() - start
+        timings[name] = total / runs
+    return timings
+
+
+def bench_detect(data=None, runs=RUNS, fast=False, native=None):
+    """
+    End-to-end detect_all() latencies in seconds.
+
+    Args:
+        data: Fixture to replay (None = live detection on this host)
+        runs: Number of runs
+        fast: Use the fast verdict mode
+        native: Backend for live runs (default: auto)
+    """
+    latencies = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        if data is None:
+            VPNDetector(native=native).detect_all(fast=fast)
+        else:
+            replay(data, fast=fast)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def _summary(latencies):
+    ordered = sorted(latencies)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    return f"median {statistics.median(ordered) * 1000:8.3f} ms  p95 {p95 * 1000:8.3f} ms"
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="python -m dcft.vpn_fixtures",
+                                     description="Record, replay and benchmark VPN detection")
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    record_parser = commands.add_parser('record', help="save a live detection run as a fixture")
+    record_parser.add_argument('path', help="fixture file to write")
+    record_parser.add_argument('--no-native', action='store_true', help="record command outputs instead of /proc reads")
+    record_parser.add_argument('--description', default=None, help="note stored in the fixture")
+
+    replay_parser = commands.add_parser('replay', help="replay fixtures and compare verdicts")
+    replay_parser.add_argument('path', nargs='?', default=None, help="fixture file or directory")
+
+    bench_parser = commands.add_parser('bench', help="time each check and detect_all()")
+    bench_parser.add_argument('path', nargs='?', default=None, help="fixture file or directory")
+    bench_parser.add_argument('--runs', type=int, default=RUNS, help="runs per measurement")
+    bench_parser.add_argument('--live', action='store_true', help="also time live detection on this host")
+    args = parser.parse_args(argv)
+
+    if args.command == 'record':
+        results = record(args.path, native=False if args.no_native else None, description=args.description)
+        print(f"[VPN] Recorded {args.path} (vpn_detected={results['vpn_detected']})")
+        return 0
+
+    fixtures = load_fixtures(args.path)
+    if args.command == 'replay':
+        failed = 0
+        for name, data in fixtures:
+            mismatches = compare(data, replay(data))
+            failed += bool(mismatches)
+            print(f"[VPN] {'FAIL' if mismatches else 'ok':4} {name}")
+            for mismatch in mismatches:
+                print(f"[VPN]        {mismatch}")
+        return 1 if failed else 0
+
+    for name, data in fixtures:
+        print(f"[BENCH] {name} ({data.get('system')}{', native' if data.get('native') else ''})")
+        for method, seconds in bench_methods(data, args.runs).items():
+            print(f"[BENCH]   {method:18} {seconds * 1e6:10.1f} us")
+        print(f"[BENCH]   {'detect_all':18} {_summary(bench_detect(data, args.runs))}")
+        print(f"[BENCH]   {'detect_all fast':18} {_summary(bench_detect(data, args.runs, fast=True))}")
+    if args.live:
+        print("[BENCH] live")
+        for native in ((True, False) if vpn_linux.available() else (False,)):
+            label = 'native' if native else 'commands'
+            print(f"[BENCH]   {label:18} {_summary(bench_detect(runs=LIVE_RUNS, native=native))}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,263 @@
+"""
+Fork-free Linux probes for VPN detection
+- Routes from /proc/net/route, interfaces from /sys/class/net
+- Processes from /proc/*/comm, resolvers from /etc/resolv.conf
+- Gateway reachability/latency and first-hop tracing over plain sockets
+"""
+import os
+import errno
+import socket
+import struct
+import selectors
+import time
+from typing import Dict, List, Optional
+
+PROC_ROUTE = '/proc/net/route'
+SYS_NET = '/sys/class/net'
+RESOLV_CONF = '/etc/resolv.conf'
+
+# linux/if_arp.h device types that are never plain Ethernet/Wi-Fi
+ARPHRD_PPP = 512
+ARPHRD_TUNNEL = 768
+ARPHRD_TUNNEL6 = 769
+ARPHRD_SIT = 776
+ARPHRD_IPGRE = 778
+ARPHRD_LOOPBACK = 772
+ARPHRD_NONE = 65534  # tun, wireguard
+VIRTUAL_TYPES = {ARPHRD_PPP, ARPHRD_TUNNEL, ARPHRD_TUNNEL6, ARPHRD_SIT, ARPHRD_IPGRE, ARPHRD_NONE}
+
+# Created down by the tunnel modules on load (common on Docker/Kubernetes
+# hosts) and never carry a VPN themselves
+FALLBACK_DEVICES = {'sit0', 'tunl0', 'gre0', 'gretap0', 'erspan0', 'ip6tnl0',
+                    'ip6gre0', 'ip_vti0', 'ip6_vti0'}
+
+IFF_UP = 0x1
+IFF_POINTOPOINT = 0x10
+RTF_GATEWAY = 0x2
+
+# Not exported by the socket module
+IP_RECVERR = 11
+SO_EE_ORIGIN_ICMP = 2
+ICMP_TIME_EXCEEDED = 11
+ICMP_DEST_UNREACH = 3
+
+PROBE_PORTS = (53, 80, 443)
+
+# rtnetlink multicast groups (linux/rtnetlink.h)
+RTMGRP_LINK = 0x1
+RTMGRP_IPV4_IFADDR = 0x10
+RTMGRP_IPV4_ROUTE = 0x40
+
+
+def available() -> bool:
+    """True when the kernel interfaces used here are readable."""
+    return os.access(PROC_ROUTE, os.R_OK) and os.path.isdir(SYS_NET)
+
+
+def open_route_monitor(groups: int = RTMGRP_LINK | RTMGRP_IPV4_IFADDR | RTMGRP_IPV4_ROUTE) -> Optional[socket.socket]:
+    """
+    Netlink socket that receives a message whenever links, addresses or
+    routes change.
+
+    Returns:
+        socket: Blocking NETLINK_ROUTE socket, or None if netlink is unavailable
+    """
+    try:
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, socket.NETLINK_ROUTE)
+    except (AttributeError, OSError):
+        return None
+    try:
+        sock.bind((0, groups))
+    except OSError:
+        sock.close()
+        return None
+    return sock
+
+
+def _hex_to_ip(value: str) -> str:
+    return socket.inet_ntoa(struct.pack('<I', int(value, 16)))
+
+
+def read_routes() -> List[Dict]:
+    """Parse /proc/net/route into dicts with iface/destination/gateway/mask/flags/metric"""
+    routes = []
+    with open(PROC_ROUTE, 'r') as f:
+        next(f, None)
+        for line in f:
+            fields = line.split()
+            if len(fields) < 8:
+                continue
+            routes.append({
+                'iface': fields[0],
+                'destination': _hex_to_ip(fields[1]),
+                'gateway': _hex_to_ip(fields[2]),
+                'flags': int(fields[3], 16),
+                'metric': int(fields[6]),
+                'mask': _hex_to_ip(fields[7]),
+            })
+    return routes
+
+
+def default_gateway(routes: Optional[List[Dict]] = None) -> Optional[str]:
+    """Gateway of the lowest-metric default route"""
+    routes = read_routes() if routes is None else routes
+    defaults = [r for r in routes
+                if r['destination'] == '0.0.0.0' and r['mask'] == '0.0.0.0' and r['flags'] & RTF_GATEWAY]
+    if not defaults:
+        return None
+    return min(defaults, key=lambda r: r['metric'])['gateway']
+
+
+def _read_sys(iface: str, name: str) -> Optional[str]:
+    try:
+        with open(os.path.join(SYS_NET, iface, name), 'r') as f:
+            return f.read().strip()
+    except OSError:
+        return None
+
+
+def read_interfaces() -> List[Dict]:
+    """Interfaces from /sys/class/net with name/type/mtu/flags/operstate"""
+    interfaces = []
+    for name in sorted(os.listdir(SYS_NET)):
+        dev_type, mtu, flags = _read_sys(name, 'type'), _read_sys(name, 'mtu'), _read_sys(name, 'flags')
+        interfaces.append({
+            'name': name,
+            'type': int(dev_type) if dev_type and dev_type.isdigit() else None,
+            'mtu': int(mtu) if mtu and mtu.isdigit() else None,
+            'flags': int(flags, 16) if flags else 0,
+            'operstate': _read_sys(name, 'operstate'),
+        })
+    return interfaces
+
+
+def is_up(iface: Dict) -> bool:
+    """Administratively up and not one of the kernel's fallback tunnel devices"""
+    return bool(iface['flags'] & IFF_UP) and iface['name'] not in FALLBACK_DEVICES
+
+
+def is_virtual(iface: Dict) -> bool:
+    """Tunnel-like device that is up: tun/wireguard/ppp/GRE type, or point-to-point"""
+    if iface['type'] == ARPHRD_LOOPBACK or not is_up(iface):
+        return False
+    return iface['type'] in VIRTUAL_TYPES or bool(iface['flags'] & IFF_POINTOPOINT)
+
+
+def read_process_names() -> List[str]:
+    """Command names of all processes, from /proc/*/comm"""
+    names = []
+    for pid in os.listdir('/proc'):
+        if not pid.isdigit():
+            continue
+        try:
+            with open(f'/proc/{pid}/comm', 'r') as f:
+                names.append(f.read().strip())
+        except OSError:
+            continue
+    return names
+
+
+def read_nameservers(path: str = RESOLV_CONF) -> List[str]:
+    """nameserver entries of resolv.conf"""
+    servers = []
+    try:
+        with open(path, 'r') as f:
+            for line in f:
+                fields = line.split()
+                if len(fields) >= 2 and fields[0] == 'nameserver':
+                    servers.append(fields[1])
+    except OSError:
+        pass
+    return servers
+
+
+def probe_host(host: str, timeout: float = 1.0, ports=PROBE_PORTS) -> Optional[float]:
+    """
+    In-process reachability probe.
+
+    A TCP handshake that completes or is actively refused both prove the
+    host answered; the time until then is used as the round-trip latency.
+    All ports are tried at once, so a filtered host costs timeout, not
+    timeout per port.
+
+    Returns:
+        float: Latency in milliseconds, or None if the host did not answer
+    """
+    answered = (0, errno.ECONNREFUSED)
+    selector = selectors.DefaultSelector()
+    sockets = []
+    start = time.perf_counter()
+    try:
+        for port in ports:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            sockets.append(sock)
+            sock.setblocking(False)
+            err = sock.connect_ex((host, port))
+            if err in answered:
+                return (time.perf_counter() - start) * 1000
+            if err in (errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+                selector.register(sock, selectors.EVENT_WRITE)
+        deadline = time.monotonic() + timeout
+        while selector.get_map():
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            for key, _ in selector.select(remaining):
+                if key.fileobj.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR) in answered:
+                    return (time.perf_counter() - start) * 1000
+                selector.unregister(key.fileobj)
+        return None
+    except OSError:
+        return None
+    finally:
+        selector.close()
+        for sock in sockets:
+            sock.close()
+
+
+def trace_first_hops(host: str, max_hops: int = 3, timeout: float = 1.0, port: int = 33434) -> int:
+    """
+    Unprivileged UDP traceroute towards host using IP_RECVERR.
+
+    Sends one probe per TTL and reads the ICMP reply from the socket error
+    queue, stopping once the destination itself answers.
+
+    Returns:
+        int: Number of hops that did not answer (like '*' in traceroute)
+    """
+    silent = 0
+    for ttl in range(1, max_hops + 1):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.setsockopt(socket.IPPROTO_IP, socket.IP_TTL, ttl)
+            sock.setsockopt(socket.IPPROTO_IP, IP_RECVERR, 1)
+            sock.settimeout(timeout)
+            sock.sendto(b'\0' * 32, (host, port + ttl))
+            deadline = time.monotonic() + timeout
+            answered = reached = False
+            while time.monotonic() < deadline:
+                try:
+                    _, ancdata, _, _ = sock.recvmsg(512, 512, socket.MSG_ERRQUEUE)
+                except BlockingIOError:
+                    # Error queue still empty; poll() reports POLLERR when it fills
+                    time.sleep(0.005)
+                    continue
+                except socket.timeout:
+                    break
+                for level, kind, data in ancdata:
+                    if level != socket.IPPROTO_IP or kind != IP_RECVERR or len(data) < 16:
+                        continue
+                    ee_errno, origin, icmp_type = struct.unpack('=IBB', data[:6])
+                    if origin == SO_EE_ORIGIN_ICMP:
+                        answered = True
+                        reached = icmp_type == ICMP_DEST_UNREACH or ee_errno == errno.ECONNREFUSED
+                break
+            if not answered:
+                silent += 1
+            if reached:
+                break
+        except OSError:
+            silent += 1
+        finally:
+            sock.close()
+    return silent
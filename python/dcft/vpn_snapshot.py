@@ -0,0 +1,195 @@
+"""
+Per-run snapshot of the system state VPN detection looks at
+- Routes, links, addresses, processes and resolver config are each
+  collected at most once, on first use, and shared by every check
+- Active probes (ping, traceroute, public IP lookup) are recorded too,
+  so a saved snapshot replays a whole detection run without touching
+  the network or running any command
+"""
+import re
+import json
+import platform
+import subprocess
+import threading
+from typing import Any, Callable, Dict, List, Optional
+from . import vpn_linux
+
+SOURCES = ('routes', 'gateway', 'links', 'addrs', 'processes', 'connections', 'resolv', 'adapters')
+# Parsed from other sources, so still available when replaying a frozen snapshot
+DERIVED = ('gateway',)
+COMMAND_TIMEOUT = 5
+
+
+def _run(cmd) -> str:
+    result = subprocess.run(cmd, capture_output=True, text=True, timeout=COMMAND_TIMEOUT)
+    return result.stdout
+
+
+class SystemSnapshot:
+    """
+    Lazily collected, memoized system state.
+
+    In native mode (Linux with /proc and /sys) routes, links, processes and
+    resolvers are structured lists read from the kernel; otherwise every
+    source is the raw text output of the platform's command.
+
+    Usage:
+        snapshot = SystemSnapshot()
+        snapshot.get('routes')
+        snapshot.save('snapshot.json')
+        replay = SystemSnapshot.load('snapshot.json')
+    """
+
+    def __init__(self, system: Optional[str] = None, native: Optional[bool] = None,
+                 sources: Optional[Dict[str, Any]] = None, frozen: bool = False):
+        """
+        Args:
+            system: platform.system() value (default: this host)
+            native: Read /proc and /sys instead of running commands (default: auto on Linux)
+            sources: Pre-collected sources
+            frozen: Never collect or probe; sources not given read as None (replay)
+        """
+        self.system = system or platform.system()
+        if native is None:
+            native = self.system == "Linux" and vpn_linux.available()
+        self.native = native
+        self.sources = dict(sources or {})
+        self.frozen = frozen
+        self._lock = threading.Lock()
+        self._loading = {}
+
+    def get(self, name: str) -> Any:
+        """Return a source, collecting it on first use (None if unavailable)"""
+        if name in self.sources or (self.frozen and name not in DERIVED):
+            return self.sources.get(name)
+        # One lock per source: concurrent checks share a single collection
+        with self._lock:
+            lock = self._loading.setdefault(name, threading.Lock())
+        with lock:
+            if name not in self.sources:
+                try:
+                    self.sources[name] = self._collect(name)
+                except:
+                    self.sources[name] = None
+        return self.sources[name]
+
+    def collect_all(self) -> 'SystemSnapshot':
+        """Collect every source now (e.g. before saving)"""
+        for name in SOURCES:
+            self.get(name)
+        return self
+
+    def probe(self, key: str, func: Callable[[], Any]) -> Any:
+        """
+        Result of an active probe, recorded under probes[key].
+
+        Live snapshots run func once per key; frozen ones return the
+        recorded result and re-raise a recorded failure. A probe that
+        was never recorded fails like a probe that could not run.
+        """
+        probes = self.sources.setdefault('probes', {})
+        if key not in probes:
+            if self.frozen:
+                raise LookupError(f"probe not recorded: {key}")
+            try:
+                probes[key] = {'value': func()}
+            except Exception as e:
+                probes[key] = {'error': repr(e)}
+        recorded = probes[key]
+        if 'error' in recorded:
+            raise RuntimeError(recorded['error'])
+        return recorded['value']
+
+    def run(self, key: str, cmd: List[str], timeout: float = COMMAND_TIMEOUT) -> Dict:
+        """Run a probe command; returns {'returncode', 'stdout'}"""
+        def execute():
+            result = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout)
+            return {'returncode': result.returncode, 'stdout': result.stdout}
+        return self.probe(key, execute)
+
+    def default_gateway(self) -> Optional[str]:
+        """Default gateway IP"""
+        return self.get('gateway')
+
+    def _collect(self, name: str) -> Any:
+        system = self.system
+        if name == 'routes':
+            if self.native:
+                return vpn_linux.read_routes()
+            if system == "Windows":
+                return _run(['route', 'print', '0.0.0.0'])
+            if system == "Linux":
+                return _run(['ip', 'route'])
+            return _run(['netstat', '-rn'])
+        if name == 'gateway':
+            return self._parse_gateway()
+        if name == 'links':
+            if self.native:
+                return vpn_linux.read_interfaces()
+            if system == "Windows":
+                return _run(['netsh', 'interface', 'ipv4', 'show', 'subinterfaces'])
+            if system == "Linux":
+                return _run(['ip', 'link'])
+            return self.get('addrs')
+        if name == 'addrs':
+            if system == "Windows":
+                return _run(['ipconfig', '/all'])
+            if system == "Linux":
+                return _run(['ip', 'addr'])
+            return _run(['ifconfig'])
+        if name == 'processes':
+            if self.native:
+                return vpn_linux.read_process_names()
+            if system == "Windows":
+                return _run(['tasklist', '/FO', 'CSV', '/NH'])
+            return _run(['ps', 'aux'])
+        if name == 'connections':
+            return _run(['netstat', '-ano']) if system == "Windows" else None
+        if name == 'resolv':
+            if self.native:
+                return vpn_linux.read_nameservers()
+            if system == "Windows":
+                return None
+            with open(vpn_linux.RESOLV_CONF, 'r') as f:
+                return f.read()
+        if name == 'adapters':
+            return _run(['wmic', 'nic', 'get', 'name,netenabled']) if system == "Windows" else None
+        raise KeyError(name)
+
+    def _parse_gateway(self) -> Optional[str]:
+        if self.native:
+            return vpn_linux.default_gateway(self.get('routes') or [])
+        if self.system == "Windows":
+            for line in (self.get('addrs') or '').split('\n'):
+                if 'Default Gateway' in line or 'デフォルト ゲートウェイ' in line:
+                    match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
+                    if match:
+                        return match.group(1)
+            return None
+        routes = self.get('routes') or ''
+        if self.system == "Linux":
+            match = re.search(r'^default via (\d+\.\d+\.\d+\.\d+)', routes, re.MULTILINE)
+        else:
+            match = re.search(r'^default\s+(\d+\.\d+\.\d+\.\d+)', routes, re.MULTILINE)
+        return match.group(1) if match else None
+
+    def to_dict(self) -> Dict:
+        """Serializable form of everything collected so far"""
+        return {'system': self.system, 'native': self.native, 'sources': dict(self.sources)}
+
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'SystemSnapshot':
+        """Frozen snapshot for replaying a saved run"""
+        return cls(system=data.get('system'), native=data.get('native', False),
+                   sources=data.get('sources'), frozen=True)
+
+    def save(self, path: str):
+        """Write the snapshot as JSON"""
+        with open(path, 'w') as f:
+            json.dump(self.to_dict(), f, indent=2, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, path: str) -> 'SystemSnapshot':
+        """Read a snapshot written by save()"""
+        with open(path, 'r') as f:
+            return cls.from_dict(json.load(f))
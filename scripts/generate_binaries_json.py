@@ -6,27 +6,101 @@ This script creates a JSON file with platform-specific binary information includ
 - SHA256 checksums
 - MD5 checksums
 - File sizes
+- Compressed (.xz) variants of large binaries with their own size and digest
+- Per-chunk SHA256 hashes and their Merkle root, for partial verification/repair
+
+Alongside bin.json it writes a release index (releases/index.json) and one
+small shard per platform (releases/<platform>.json), so clients can check
+for a newer build by fetching only their own entry.
+
+Files are hashed (and compressed) in a single read each, across a process
+pool. Entries of the previous bin.json are reused for files whose size and
+mtime_ns both match what was recorded for them; pass --full to rehash
+everything.
 """
 
 import os
 import json
+import lzma
+import argparse
 import hashlib
 from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor
 
 # Repository information
 REPO_OWNER = "QudsLab"
 REPO_NAME = "Cloudflared"
 BRANCH = "main"  # Change to "master" if that's your default branch
 BASE_URL = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/{BRANCH}/binaries"
+RELEASES_BASE_URL = f"https://raw.githubusercontent.com/{REPO_OWNER}/{REPO_NAME}/{BRANCH}/releases"
+
+# Compressed variants are only published for files at least this large
+COMPRESS_MIN_SIZE = 1024 * 1024
+COMPRESSED_SUFFIX = '.xz'
+CHECKSUM_FILES = ['MD5SUMS.txt', 'SHA256SUMS.txt']
+
+# Chunk size used for the per-file Merkle manifest
+MERKLE_CHUNK_SIZE = 1024 * 1024
+
+RELEASES_DIR = 'releases'
 
 def calculate_file_hash(filepath, algorithm='sha256'):
     """Calculate hash of a file."""
     hash_obj = hashlib.new(algorithm)
     with open(filepath, 'rb') as f:
-        for chunk in iter(lambda: f.read(4096), b''):
+        for chunk in iter(lambda: f.read(MERKLE_CHUNK_SIZE), b''):
             hash_obj.update(chunk)
     return hash_obj.hexdigest()
 
+def merkle_root(chunk_hashes):
+    """Merkle root over hex chunk digests (pairs hashed together, odd node carried up)."""
+    level = [bytes.fromhex(h) for h in chunk_hashes]
+    if not level:
+        return hashlib.sha256(b'').hexdigest()
+    while len(level) > 1:
+        paired = [hashlib.sha256(level[i] + level[i + 1]).digest() for i in range(0, len(level) - 1, 2)]
+        if len(level) % 2:
+            paired.append(level[-1])
+        level = paired
+    return level[0].hex()
+
+def hash_file(filepath, compress=False):
+    """
+    Hash a file in a single read.
+    
+    Computes SHA256, MD5 and the per-chunk SHA256 list together, and when
+    compress is True writes the .xz variant from the same buffers.
+    
+    Returns:
+        tuple: (sha256, md5, chunk_hashes, compressed_path or None)
+    """
+    sha256 = hashlib.sha256()
+    md5 = hashlib.md5()
+    chunk_hashes = []
+    compressed_path = filepath.with_name(filepath.name + COMPRESSED_SUFFIX)
+    tmp_path = compressed_path.with_name(compressed_path.name + '.tmp')
+    compressor = lzma.LZMACompressor(preset=6) if compress else None
+    dst = open(tmp_path, 'wb') if compress else None
+    
+    try:
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(MERKLE_CHUNK_SIZE), b''):
+                sha256.update(chunk)
+                md5.update(chunk)
+                chunk_hashes.append(hashlib.sha256(chunk).hexdigest())
+                if compressor:
+                    dst.write(compressor.compress(chunk))
+        if compressor:
+            dst.write(compressor.flush())
+    finally:
+        if dst:
+            dst.close()
+    
+    if compressor:
+        os.replace(tmp_path, compressed_path)
+        return sha256.hexdigest(), md5.hexdigest(), chunk_hashes, compressed_path
+    return sha256.hexdigest(), md5.hexdigest(), chunk_hashes, None
+
 def get_file_size(filepath):
     """Get file size in bytes."""
     return os.path.getsize(filepath)
@@ -43,81 +117,219 @@ def read_checksum_file(filepath, filename):
         return None
     return None
 
-def generate_binaries_json():
-    """Generate bin.json file with binary metadata."""
+def describe_file(binary_file, platform_name, sha256=None, md5=None):
+    """Build the bin.json entry for one binary (runs in a worker process)."""
+    # Stat before reading, so a file rewritten mid-hash never matches its entry
+    st = binary_file.stat()
+    size = st.st_size
+    compressed_file = binary_file.with_name(binary_file.name + COMPRESSED_SUFFIX)
+    # Only files whose entry could not be reused get here, so an existing
+    # .xz can't be trusted (mtimes survive cp -p/rsync -t): always recompress
+    needs_compress = size >= COMPRESS_MIN_SIZE
+    
+    file_sha256, file_md5, chunk_hashes, _ = hash_file(binary_file, compress=needs_compress)
+    
+    file_info = {
+        "filename": binary_file.name,
+        "url": f"{BASE_URL}/{platform_name}/{binary_file.name}",
+        # Checksums from MD5SUMS.txt/SHA256SUMS.txt take precedence
+        "sha256": sha256 or file_sha256,
+        "md5": md5 or file_md5,
+        "size": size,
+        # Lets the next incremental run tell whether the file changed
+        "mtime_ns": st.st_mtime_ns
+    }
+    
+    # Chunk hashes let clients verify and repair large files piecewise
+    if size > MERKLE_CHUNK_SIZE:
+        file_info["chunks"] = {
+            "size": MERKLE_CHUNK_SIZE,
+            "root": merkle_root(chunk_hashes),
+            "hashes": chunk_hashes
+        }
+    
+    # Publish a compressed variant for large binaries
+    if size >= COMPRESS_MIN_SIZE:
+        file_info["compressed"] = {
+            "format": "xz",
+            "filename": compressed_file.name,
+            "url": f"{BASE_URL}/{platform_name}/{compressed_file.name}",
+            "sha256": calculate_file_hash(compressed_file, 'sha256'),
+            "size": get_file_size(compressed_file),
+            "mtime_ns": compressed_file.stat().st_mtime_ns
+        }
+    
+    return file_info
+
+def load_previous_entries(output_file):
+    """Map (platform, filename) to entries of an existing bin.json."""
+    try:
+        with open(output_file, 'r') as f:
+            previous = json.load(f)
+        entries = {
+            (platform_name, entry['filename']): entry
+            for platform_name, platform_data in previous.get('platforms', {}).items()
+            for entry in platform_data.get('files', [])
+        }
+        return entries
+    except (OSError, ValueError, KeyError, AttributeError):
+        return {}
+
+def unchanged(entry, path):
+    """Whether path still has the size and mtime_ns recorded in entry."""
+    try:
+        st = path.stat()
+    except OSError:
+        return False
+    return entry.get('size') == st.st_size and entry.get('mtime_ns') == st.st_mtime_ns
+
+def reuse_entry(entry, binary_file, platform_name):
+    """Return the previous entry if binary_file is unchanged since it was described."""
+    if not entry or not unchanged(entry, binary_file):
+        return None
+    st = binary_file.stat()
+    if st.st_size > MERKLE_CHUNK_SIZE and 'chunks' not in entry:
+        return None
+    if st.st_size >= COMPRESS_MIN_SIZE:
+        compressed_file = binary_file.with_name(binary_file.name + COMPRESSED_SUFFIX)
+        variant = entry.get('compressed') or {}
+        if not unchanged(variant, compressed_file):
+            return None
+        variant['url'] = f"{BASE_URL}/{platform_name}/{compressed_file.name}"
+    entry['url'] = f"{BASE_URL}/{platform_name}/{binary_file.name}"
+    return entry
+
+def build_id(files_data):
+    """Identifier of a platform build: SHA256 over its files' names and digests."""
+    digest = hashlib.sha256()
+    for file_info in sorted(files_data, key=lambda f: f['filename']):
+        digest.update(f"{file_info['filename']}:{file_info['sha256']}\n".encode())
+    return digest.hexdigest()[:16]
+
+def write_json(path, data):
+    """Write JSON atomically."""
+    tmp_path = path.with_name(path.name + '.tmp')
+    with open(tmp_path, 'w') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def write_release_index(platforms_data, version):
+    """Write releases/index.json and one shard per platform."""
+    releases_dir = Path(RELEASES_DIR)
+    releases_dir.mkdir(exist_ok=True)
+    index = {"version": version, "platforms": {}}
+    
+    for platform_name, platform_data in sorted(platforms_data.items()):
+        build = build_id(platform_data['files'])
+        write_json(releases_dir / f"{platform_name}.json", {
+            "version": version,
+            "build": build,
+            "platform": platform_name,
+            "files": platform_data['files']
+        })
+        index["platforms"][platform_name] = {
+            "build": build,
+            "url": f"{RELEASES_BASE_URL}/{platform_name}.json"
+        }
+    
+    write_json(releases_dir / 'index.json', index)
+
+def read_previous_version(output_file):
+    try:
+        with open(output_file, 'r') as f:
+            return json.load(f).get('version')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def generate_binaries_json(jobs=None, incremental=True, version=None):
+    """
+    Generate bin.json file with binary metadata.
+    
+    Args:
+        jobs: Number of worker processes (default: CPU count)
+        incremental: Reuse entries from the existing bin.json for unchanged files
+        version: cloudflared version being published (default: keep the previous one)
+    """
     binaries_dir = Path('binaries')
+    output_file = Path('bin.json')
     
     if not binaries_dir.exists():
         print("Error: binaries directory not found")
         return
     
+    previous = load_previous_entries(output_file) if incremental else {}
     platforms_data = {}
+    pending = {}
+    reused = 0
     
-    # Iterate through each platform directory
-    for platform_dir in sorted(binaries_dir.iterdir()):
-        if not platform_dir.is_dir():
-            continue
-        
-        platform_name = platform_dir.name
-        files_data = []
-        
-        # Find binary files (exclude checksum files)
-        binary_files = [f for f in platform_dir.iterdir() 
-                       if f.is_file() and f.name not in ['MD5SUMS.txt', 'SHA256SUMS.txt']]
-        
-        md5_file = platform_dir / 'MD5SUMS.txt'
-        sha256_file = platform_dir / 'SHA256SUMS.txt'
-        
-        for binary_file in sorted(binary_files):
-            filename = binary_file.name
+    with ProcessPoolExecutor(max_workers=jobs) as pool:
+        # Iterate through each platform directory
+        for platform_dir in sorted(binaries_dir.iterdir()):
+            if not platform_dir.is_dir():
+                continue
             
-            # Read checksums from files
-            sha256 = read_checksum_file(sha256_file, filename)
-            md5 = read_checksum_file(md5_file, filename)
+            platform_name = platform_dir.name
+            files_data = []
             
-            # Calculate checksums if not found in files
-            if sha256 is None:
-                sha256 = calculate_file_hash(binary_file, 'sha256')
-            if md5 is None:
-                md5 = calculate_file_hash(binary_file, 'md5')
+            # Find binary files (exclude checksum files and generated variants)
+            binary_files = [f for f in platform_dir.iterdir() 
+                           if f.is_file() and f.name not in CHECKSUM_FILES
+                           and not f.name.endswith((COMPRESSED_SUFFIX, '.tmp'))]
             
-            # Get file size
-            size = get_file_size(binary_file)
+            md5_file = platform_dir / 'MD5SUMS.txt'
+            sha256_file = platform_dir / 'SHA256SUMS.txt'
             
-            # Create GitHub raw URL
-            file_url = f"{BASE_URL}/{platform_name}/{filename}"
+            for binary_file in sorted(binary_files):
+                filename = binary_file.name
+                
+                entry = reuse_entry(previous.get((platform_name, filename)), binary_file, platform_name)
+                if entry:
+                    reused += 1
+                    files_data.append(entry)
+                    continue
+                
+                # Read checksums from files; missing ones are computed by the worker
+                sha256 = read_checksum_file(sha256_file, filename)
+                md5 = read_checksum_file(md5_file, filename)
+                
+                index = len(files_data)
+                files_data.append(None)
+                pending[pool.submit(describe_file, binary_file, platform_name, sha256, md5)] = (files_data, index)
             
-            file_info = {
-                "filename": filename,
-                "url": file_url,
-                "sha256": sha256,
-                "md5": md5,
-                "size": size
+            platforms_data[platform_name] = {
+                "files": files_data
             }
-            
-            files_data.append(file_info)
         
-        platforms_data[platform_name] = {
-            "files": files_data
-        }
+        for future, (files_data, index) in pending.items():
+            files_data[index] = future.result()
+    
+    version = version or read_previous_version(output_file) or "unknown"
     
     # Create final JSON structure
     output = {
         "repository": f"https://github.com/{REPO_OWNER}/{REPO_NAME}",
+        "version": version,
         "platforms": platforms_data
     }
     
     # Write to bin.json in repository root
-    output_file = Path('bin.json')
     with open(output_file, 'w') as f:
         json.dump(output, f, indent=2)
+    write_release_index(platforms_data, version)
     
-    print(f"✓ Generated {output_file} with {len(platforms_data)} platforms")
+    print(f"✓ Generated {output_file} with {len(platforms_data)} platforms (version {version})")
+    print(f"✓ Release index: {RELEASES_DIR}/index.json")
     
     # Print summary
     total_files = sum(len(p['files']) for p in platforms_data.values())
-    print(f"✓ Total files: {total_files}")
+    print(f"✓ Total files: {total_files} ({len(pending)} hashed, {reused} reused)")
     print(f"✓ Platforms: {', '.join(sorted(platforms_data.keys()))}")
 
 if __name__ == '__main__':
-    generate_binaries_json()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Generate bin.json from the binaries directory")
+    parser.add_argument('--jobs', type=int, default=None, help="worker processes (default: CPU count)")
+    parser.add_argument('--full', action='store_true', help="rehash every file instead of reusing bin.json entries")
+    parser.add_argument('--version', default=os.environ.get('CLOUDFLARED_VERSION'),
+                        help="cloudflared version being published (default: $CLOUDFLARED_VERSION)")
+    args = parser.parse_args()
+    generate_binaries_json(jobs=args.jobs, incremental=not args.full, version=args.version)
\ No newline at end of file